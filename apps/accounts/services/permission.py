@@ -1,15 +1,45 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from accounts.models import Permission, Role, SystemUser
+from common.cache.version import VersionTracker
 from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Q, QuerySet
 from django.utils import timezone
 
 
+class PermissionSnapshot:
+    """
+    某个 RBAC 版本下编译好的权限, 权限编码映射为位序号, 每个角色的权限编译为一个整数位图
+    用户的权限为其所有角色位图的或, 检查权限只需一次位运算
+    """
+
+    def __init__(self, version: int, bits: Dict[str, int], role_masks: Dict[int, int]):
+        self.version = version
+        self.bits = bits
+        self.role_masks = role_masks
+        # 用户 ID -> 权限位图, 只在当前版本内有效
+        self.user_masks: Dict[int, int] = {}
+
+    def get_codes(self, mask: int) -> List[str]:
+        return [code for code, bit in self.bits.items() if mask >> bit & 1]
+
+
 class PermissionService:
-    PERMISSIONS_CACHE_KEY_TEMPLATE = "accounts:permissions:user:{user_id}"
-    PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+    # RBAC 全局版本号, 角色, 权限或用户的角色变更后递增, 所有进程的权限缓存随之失效
+    RBAC_VERSION_KEY = "accounts:rbac:version"
+    RBAC_VERSION_CHANNEL = "accounts:rbac:version_changed"
+    # 按版本号缓存编译好的权限和用户的角色 ID, 版本号变更后不再读取, 到期后自动删除
+    RBAC_SNAPSHOT_KEY_TEMPLATE = "accounts:rbac:snapshot:{version}"
+    RBAC_USER_ROLES_KEY_TEMPLATE = "accounts:rbac:user_roles:{version}:{user_id}"
+    RBAC_CACHE_TIMEOUT = 60 * 60
+    # 进程内缓存的用户权限位图数量上限, 超过后清空
+    RBAC_USER_MASKS_MAX_SIZE = 10000
+
+    rbac_version = VersionTracker(
+        "rbac", key=RBAC_VERSION_KEY, channel=RBAC_VERSION_CHANNEL
+    )
+    _snapshot: Optional[PermissionSnapshot] = None
 
     @staticmethod
     def get_by_id(permission_id: int) -> Optional[Permission]:
@@ -75,8 +105,9 @@ class PermissionService:
             created_name=created.nickname if created else "",
         )
 
-    @staticmethod
+    @classmethod
     def update(
+        cls,
         instance: Permission,
         permission_data: dict,
         updated: Optional[SystemUser] = None,
@@ -89,6 +120,9 @@ class PermissionService:
         instance.updated = updated
         instance.updated_name = updated.nickname if updated else ""
         instance.save()
+
+        # 权限编码可能已变更
+        cls.clear_permissions_cache()
         return instance
 
     @classmethod
@@ -109,10 +143,7 @@ class PermissionService:
             updated_at=now,
         )
 
-        related_roles = Role.objects.filter(permission__in=permissions_to_delete)
-        related_users = SystemUser.objects.filter(role__in=related_roles)
-        for user in related_users:
-            cls.clear_user_permissions_cache(user.id)
+        cls.clear_permissions_cache()
 
     @staticmethod
     def _get_all_descendants(permission: Permission) -> QuerySet:
@@ -123,29 +154,94 @@ class PermissionService:
             Q(id=permission.id) | Q(parent_id=permission.id)
         )
 
+    @staticmethod
+    def compile_snapshot() -> dict:
+        """
+        从数据库编译权限, 按 ID 顺序为权限编码分配位序号, 计算每个角色的权限位图
+        """
+        bits = {
+            code: bit
+            for bit, code in enumerate(
+                Permission.objects.order_by("id").values_list("code", flat=True)
+            )
+        }
+        role_masks = {}
+        for role_id, code in Role.permission.through.objects.filter(
+            permission__is_delete=False
+        ).values_list("role_id", "permission__code"):
+            role_masks[role_id] = role_masks.get(role_id, 0) | (1 << bits[code])
+        return {"bits": bits, "role_masks": role_masks}
+
     @classmethod
-    def get_user_permissions(cls, user):
+    def get_snapshot(cls) -> PermissionSnapshot:
         """
-        获取用户所有的权限编码
+        获取当前版本的权限, 依次从进程内, Redis, 数据库获取, 每个版本只需编译一次
         """
-        key = cls.PERMISSIONS_CACHE_KEY_TEMPLATE.format(user_id=user.id)
-        cached_permission = cache.get(key)
+        version = cls.rbac_version.get()
+        snapshot = cls._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        key = cls.RBAC_SNAPSHOT_KEY_TEMPLATE.format(version=version)
+        compiled = cache.get(key)
+        if compiled is None:
+            compiled = cls.compile_snapshot()
+            cache.set(key, compiled, cls.RBAC_CACHE_TIMEOUT)
+        snapshot = PermissionSnapshot(version, **compiled)
+        cls._snapshot = snapshot
+        return snapshot
 
-        if cached_permission is not None:
-            return cached_permission
+    @classmethod
+    def get_user_mask(cls, user, snapshot: PermissionSnapshot) -> int:
+        """
+        获取用户在该版本下的权限位图, 为用户所有角色位图的或
+        """
+        mask = snapshot.user_masks.get(user.id)
+        if mask is not None:
+            return mask
 
-        permissions = list(
-            Permission.objects.filter(
-                accounts_role_permission__accounts_system_user_role=user,
-                is_delete=False,
-            ).values_list("code", flat=True)
+        key = cls.RBAC_USER_ROLES_KEY_TEMPLATE.format(
+            version=snapshot.version, user_id=user.id
         )
+        role_ids = cache.get(key)
+        if role_ids is None:
+            # 与按用户关联查询权限时一致, 直接查询关联表, 不经过角色的默认管理器
+            role_ids = list(
+                SystemUser.role.through.objects.filter(
+                    systemuser_id=user.id
+                ).values_list("role_id", flat=True)
+            )
+            cache.set(key, role_ids, cls.RBAC_CACHE_TIMEOUT)
+
+        mask = 0
+        for role_id in role_ids:
+            mask |= snapshot.role_masks.get(role_id, 0)
+
+        if len(snapshot.user_masks) >= cls.RBAC_USER_MASKS_MAX_SIZE:
+            snapshot.user_masks.clear()
+        snapshot.user_masks[user.id] = mask
+        return mask
 
-        cache.set(key, permissions, cls.PERMISSIONS_CACHE_TIMEOUT)
+    @classmethod
+    def has_permission(cls, user, code: str) -> bool:
+        snapshot = cls.get_snapshot()
+        bit = snapshot.bits.get(code)
+        if bit is None:
+            return False
+        return bool(cls.get_user_mask(user, snapshot) >> bit & 1)
 
-        return permissions
+    @classmethod
+    def get_user_permissions(cls, user) -> List[str]:
+        """
+        获取用户所有的权限编码
+        """
+        snapshot = cls.get_snapshot()
+        return snapshot.get_codes(cls.get_user_mask(user, snapshot))
 
     @classmethod
-    def clear_user_permissions_cache(cls, user_id: int):
-        key = cls.PERMISSIONS_CACHE_KEY_TEMPLATE.format(user_id=user_id)
-        cache.delete(key)
+    def clear_permissions_cache(cls):
+        """
+        递增 RBAC 版本号, 所有进程的权限缓存失效
+        在事务提交后执行, 避免其他进程在提交前按新版本号读取到旧数据
+        """
+        transaction.on_commit(cls.rbac_version.bump)
@@ -43,6 +43,9 @@ class RoleService:
         )
         if role_data["permissions"]:
             role.permission.add(*role_data["permissions"])
+
+        # 新角色加入权限缓存
+        PermissionService.clear_permissions_cache()
         return role
 
     @staticmethod
@@ -60,10 +63,8 @@ class RoleService:
         if role_data["permissions"]:
             instance.permission.add(*role_data["permissions"])
 
-        # 清除相关用户的权限缓存
-        related_users = instance.accounts_system_user_role.all()
-        for user in related_users:
-            PermissionService.clear_user_permissions_cache(user.id)
+        # 清除权限缓存
+        PermissionService.clear_permissions_cache()
 
         return instance
 
@@ -81,7 +82,5 @@ class RoleService:
             )
         )
 
-        # 清除相关用户的权限缓存
-        related_users = instance.accounts_system_user_role.all()
-        for user in related_users:
-            PermissionService.clear_user_permissions_cache(user.id)
+        # 清除权限缓存
+        PermissionService.clear_permissions_cache()
@@ -1,10 +1,12 @@
 from datetime import datetime
 from typing import Any, Optional
 
+import msgpack
 import pyotp
 from accounts.models import SystemUser
 from accounts.services.permission import PermissionService
-from authentication.constants import AuthConstants
+from authentication.services.session import SessionService
+from common.cache.local import LocalCache
 from django.contrib.auth.hashers import make_password
 from django.core.cache import cache
 from django.db import transaction
@@ -12,8 +14,20 @@ from django.utils import timezone
 
 
 class SystemUserService:
-    SYSTEM_USER_KEY_TEMPLATE = "accounts:system_user:{id}"
+    # Redis 中缓存的是 msgpack 编码的字段字典, 不再是 pickle 序列化的模型实例
+    SYSTEM_USER_KEY_TEMPLATE = "accounts:system_user:packed:{id}"
     SYSTEM_USER_KEY_TIMEOUT = 60 * 60 * 24 * 7
+    # 用户缓存失效时发布键名, 各进程删除本地缓存
+    SYSTEM_USER_INVALIDATE_CHANNEL = "accounts:system_user:invalidate"
+    SYSTEM_USER_LOCAL_CACHE_SIZE = 10000
+    SYSTEM_USER_LOCAL_CACHE_TIMEOUT = 60
+
+    local_cache = LocalCache(
+        "system_user",
+        channel=SYSTEM_USER_INVALIDATE_CHANNEL,
+        max_size=SYSTEM_USER_LOCAL_CACHE_SIZE,
+        timeout=SYSTEM_USER_LOCAL_CACHE_TIMEOUT,
+    )
 
     @staticmethod
     def _attribute_exists(
@@ -79,7 +93,7 @@ class SystemUserService:
                 instance.role.add(*new_roles)
 
             # 清除权限缓存
-            PermissionService.clear_user_permissions_cache(instance.id)
+            PermissionService.clear_permissions_cache()
 
         cls.delete_cache(instance)
 
@@ -116,19 +130,65 @@ class SystemUserService:
     def all():
         return SystemUser.objects.all().order_by("-id")
 
+    @staticmethod
+    def to_fields(instance: SystemUser) -> dict:
+        """
+        模型实例转换为字段字典, 外键只保存 ID
+        """
+        return {
+            field.attname: getattr(instance, field.attname)
+            for field in SystemUser._meta.concrete_fields
+        }
+
+    @staticmethod
+    def from_fields(fields: dict) -> SystemUser:
+        """
+        字段字典还原为模型实例, 缓存中缺少的字段(新增的字段)在访问时从数据库加载
+        """
+        attnames = [
+            field.attname
+            for field in SystemUser._meta.concrete_fields
+            if field.attname in fields
+        ]
+        return SystemUser.from_db(
+            SystemUser.objects.db, attnames, [fields[attname] for attname in attnames]
+        )
+
+    @staticmethod
+    def pack_fields(fields: dict) -> bytes:
+        """
+        字段字典编码为 msgpack, 时间字段使用 msgpack 的时间戳类型
+        """
+        return msgpack.packb(fields, datetime=True, use_bin_type=True)
+
+    @staticmethod
+    def unpack_fields(value: bytes) -> dict:
+        return msgpack.unpackb(value, timestamp=3, raw=False)
+
     @classmethod
     def get_by_id(cls, pk: int) -> Optional[SystemUser]:
+        """
+        依次从进程内缓存, Redis, 数据库获取
+        缓存中保存字段字典, 每次返回新的实例, 调用方修改实例不会影响缓存
+        """
         cache_key = cls.SYSTEM_USER_KEY_TEMPLATE.format(id=pk)
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-
-        try:
-            instance = SystemUser.objects.get(id=pk)
-        except SystemUser.DoesNotExist:
-            return None
-        cache.set(cache_key, instance, cls.SYSTEM_USER_KEY_TIMEOUT)
-        return instance
+        fields = cls.local_cache.get(cache_key)
+        if fields is None:
+            generation = cls.local_cache.generation
+            packed = cache.get_raw(cache_key)
+            if packed is not None:
+                fields = cls.unpack_fields(packed)
+            else:
+                try:
+                    instance = SystemUser.objects.get(id=pk)
+                except SystemUser.DoesNotExist:
+                    return None
+                fields = cls.to_fields(instance)
+                cache.set_raw(
+                    cache_key, cls.pack_fields(fields), cls.SYSTEM_USER_KEY_TIMEOUT
+                )
+            cls.local_cache.set(cache_key, fields, generation)
+        return cls.from_fields(fields)
 
     @classmethod
     def update_last_login_at(cls, user: SystemUser):
@@ -173,7 +233,15 @@ class SystemUserService:
 
     @classmethod
     def delete_cache(cls, user: SystemUser):
-        cache.delete(cls.SYSTEM_USER_KEY_TEMPLATE.format(id=user.id))
+        """
+        删除 Redis 和当前进程的缓存, 并通知其他进程删除本地缓存
+        """
+        cache_key = cls.SYSTEM_USER_KEY_TEMPLATE.format(id=user.id)
+        pipe = cache.pipeline()
+        pipe.delete(cache.make_key(cache_key))
+        pipe.publish(cache.make_key(cls.SYSTEM_USER_INVALIDATE_CHANNEL), cache_key)
+        pipe.execute()
+        cls.local_cache.delete(cache_key)
 
     @classmethod
     def enable_mfa(cls, user: SystemUser, mfa_type) -> str:
@@ -196,73 +264,48 @@ class SystemUserService:
 
     @staticmethod
     def get_active_sessions(user_id):
-        user_sessions_key = AuthConstants.SYSTEM_USER_ALL_SESSIONS_TEMPLATE.format(
-            user_id=user_id,
+        # 旧格式的会话先转换为 Hash, 以便列出和退出
+        SessionService.migrate_legacy_user(user_id)
+        session_data = SessionService.get_many(
+            user_id, SessionService.get_device_ids(user_id)
         )
-        device_ids = cache.smembers(user_sessions_key)
-
-        session_keys = [
-            AuthConstants.SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
-                user_id=user_id,
-                device_id=device_id,
-            )
-            for device_id in device_ids
-        ]
-
-        session_data = cache.get_many(session_keys)
         current_timestamp = int(datetime.utcnow().timestamp())
 
         sessions = []
         for data in session_data.values():
-            if data:
-                refresh_expired_time = data.get("refresh_expired_time")
-                access_expired_time = data.get("access_expired_time")
-                if (
-                    refresh_expired_time and refresh_expired_time > current_timestamp
-                ) or (access_expired_time and access_expired_time > current_timestamp):
-                    sessions.append(
-                        {
-                            "device_info": data.get("device_info"),
-                            "ip_address": data.get("ip_address", ""),
-                            "login_at": data.get("login_at"),
-                            "last_active_at": data.get("last_active_at"),
-                            "country": data.get("country"),
-                            "region": data.get("region"),
-                            "city": data.get("city"),
-                        }
-                    )
+            refresh_expired_time = data.get("refresh_expired_time")
+            access_expired_time = data.get("access_expired_time")
+            if (refresh_expired_time and refresh_expired_time > current_timestamp) or (
+                access_expired_time and access_expired_time > current_timestamp
+            ):
+                sessions.append(
+                    {
+                        "device_info": data.get("device_info"),
+                        "ip_address": data.get("ip_address", ""),
+                        "login_at": data.get("login_at"),
+                        "last_active_at": data.get("last_active_at"),
+                        "country": data.get("country"),
+                        "region": data.get("region"),
+                        "city": data.get("city"),
+                    }
+                )
         return sessions
 
     @staticmethod
     def logout_session(user_id, device_id):
         from common.services.jwt import SystemUserJWTAuthentication
 
-        device_session_key = AuthConstants.SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
-            user_id=user_id,
-            device_id=device_id,
-        )
-        user_sessions_key = AuthConstants.SYSTEM_USER_ALL_SESSIONS_TEMPLATE.format(
-            user_id=user_id,
-        )
-
-        session_data = cache.get(device_session_key)
+        # 旧格式的会话先转换, 否则退出后刷新 token 时会被重新转换而恢复
+        SessionService.migrate_legacy(user_id, device_id)
+        session_data = SessionService.get(user_id, device_id)
         if session_data:
-            refresh = session_data["refresh"]
-            refresh_expired_time = session_data["refresh_expired_time"]
-            access = session_data["access"]
-            access_expired_time = session_data["access_expired_time"]
             SystemUserJWTAuthentication.add_access_to_blacklist(
-                access,
-                access_expired_time,
+                session_data["access"],
+                session_data["access_expired_time"],
             )
             SystemUserJWTAuthentication.add_refresh_to_blacklist(
-                refresh,
-                refresh_expired_time,
+                session_data["refresh"],
+                session_data["refresh_expired_time"],
             )
 
-        cache.delete(device_session_key)
-        cache.srem(user_sessions_key, device_id)
-
-        # 如果该用户没有活跃终端，移除其 ID
-        if not cache.scard(user_sessions_key):
-            cache.srem(AuthConstants.SYSTEM_USER_ACTIVE, user_id)
+        SessionService.delete(user_id, device_id)
@@ -1,15 +1,12 @@
-import datetime
-
 from accounts.services.system_user import SystemUserService
 from common.services.jwt import SystemUserJWTAuthentication
-from django.core.cache import cache
-from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.settings import api_settings
 
-from .constants import AuthConstants
 from .serializers import (
     MAFVerifyInputSerializer,
     PasswordLoginInputSerializer,
@@ -21,6 +18,7 @@ from .serializers import (
 from .services.base_login import BaseLoginService
 from .services.mfa import MFAService
 from .services.password_login import PasswordLoginService
+from .services.session import SessionService
 from .services.sms_login import SMSLoginService
 
 
@@ -88,32 +86,31 @@ class SystemUserAuthenticationViewSet(viewsets.ViewSet):
         access_expired_second = int(refresh_token.access_token.lifetime.total_seconds())
         access_expired_time = refresh_token.access_token.payload["exp"]
 
-        device_session_key = AuthConstants.SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
-            user_id=user_id,
-            device_id=device_id,
+        # 会话中的 refresh token 一致时才替换 access token, 已退出的会话无法刷新
+        rotate_args = (
+            user_id,
+            device_id,
+            refresh_token.token,
+            access,
+            access_expired_second,
+            access_expired_time,
         )
-        session_data = cache.get(device_session_key)
-        if session_data:
-            old_access = session_data["access"]
-            old_access_expired_time = session_data["access_expired_time"]
-            SystemUserJWTAuthentication().add_access_to_blacklist(
-                old_access,
-                old_access_expired_time,
-            )
-
-            now = timezone.now()
-            session_data["access"] = access
-            session_data["access_expired_second"] = access_expired_second
-            session_data["access_expired_time"] = access_expired_time
-
-            # 动态计算剩余 TTL
-            refresh_expired_at = session_data["login_at"] + datetime.timedelta(
-                seconds=session_data["refresh_expired_second"],
+        status_code, old_access, old_access_expired_time = SessionService.rotate_access(
+            *rotate_args
+        )
+        if status_code == SessionService.ROTATE_NOT_FOUND and (
+            SessionService.migrate_legacy(user_id, device_id)
+        ):
+            status_code, old_access, old_access_expired_time = (
+                SessionService.rotate_access(*rotate_args)
             )
-            remaining_ttl = (refresh_expired_at - now).total_seconds()
+        if status_code != SessionService.ROTATE_OK:
+            raise AuthenticationFailed(_("session not found"))
 
-            if remaining_ttl > 0:
-                cache.set(device_session_key, session_data, timeout=int(remaining_ttl))
+        SystemUserJWTAuthentication.add_access_to_blacklist(
+            old_access,
+            old_access_expired_time,
+        )
 
         return Response(
             {
@@ -1,10 +1,40 @@
 class AuthConstants:
-    SYSTEM_USER_DEVICE_SESSION_TEMPLATE = (
+    # 设备会话, Hash, 字段见 SessionService
+    SYSTEM_USER_SESSION_TEMPLATE = (
+        "authentication:system_user:session:{user_id}:{device_id}"
+    )
+    # 用户的设备 ID 集合, 成员不经过序列化
+    SYSTEM_USER_SESSIONS_TEMPLATE = "authentication:system_user:sessions:{user_id}"
+    # 会话过期索引, ZSET: {user_id:device_id: 过期时间戳}, 清理时只处理已过期的成员
+    SYSTEM_USER_SESSION_EXPIRY = "authentication:system_user:session_expiry"
+    # 每次脚本调用最多清理的会话数量, 控制单次调用阻塞 Redis 的时间
+    SESSION_SWEEP_CHUNK_SIZE = 50
+    # 每次清理任务的最长执行时间(秒), 未清理完的留到下次
+    SESSION_SWEEP_TIME_BUDGET = 5
+    # 升级前以序列化字典存储的会话, 刷新 token 时转换为 Hash
+    LEGACY_SYSTEM_USER_DEVICE_SESSION_TEMPLATE = (
         "authentication:system_user:device_session:{user_id}:{device_id}"
     )
-    SYSTEM_USER_ALL_SESSIONS_TEMPLATE = (
+    # 升级前的用户设备 ID 集合, 成员经过序列化
+    LEGACY_SYSTEM_USER_ALL_SESSIONS_TEMPLATE = (
         "authentication:system_user:all_session:{user_id}"
     )
     SYSTEM_USER_ACTIVE = "accounts:system_user:active"  # nosec
-    ACCESS_TOKEN_BLACKLIST = "authentication:jwt:access:blacklist"  # nosec
-    REFRESH_TOKEN_BLACKLIST = "authentication:jwt:refresh:blacklist"  # nosec
+    # token 黑名单, Set: {token 摘要}, 按 token 的过期时间分桶, 桶内 token 全部过期后自动过期
+    ACCESS_TOKEN_BLACKLIST_TEMPLATE = "authentication:jwt:access:blacklist:{bucket}"  # nosec
+    REFRESH_TOKEN_BLACKLIST_TEMPLATE = "authentication:jwt:refresh:blacklist:{bucket}"  # nosec
+    # 黑名单每个桶覆盖的过期时间范围(秒)
+    BLACKLIST_BUCKET_SECONDS = 3600
+    # 升级前的黑名单, ZSET: {token: 过期时间戳}, 通过 migrate_token_blacklist 命令迁移
+    LEGACY_ACCESS_TOKEN_BLACKLIST = "authentication:jwt:access:blacklist"  # nosec
+    LEGACY_REFRESH_TOKEN_BLACKLIST = "authentication:jwt:refresh:blacklist"  # nosec
+    # access token 加入黑名单时发布其摘要, 各进程的过滤器订阅后增量更新
+    ACCESS_TOKEN_REVOKED_CHANNEL = "authentication:jwt:access:revoked"  # nosec
+    # 过滤器全量同步黑名单的时间间隔(秒), 同时移除已过期的 token
+    BLACKLIST_RESYNC_INTERVAL = 300
+    # 更新活跃时间的任务在队列中积压超过该时间(秒)后不再执行
+    LAST_ACTIVE_TASK_EXPIRES = 60
+    # 同一进程内每个设备最多每隔该时间(秒)写入一次上次活跃时间
+    LAST_ACTIVE_DEBOUNCE_SECONDS = 60
+    # 进程内记录的设备数量上限, 超过后清理已过去抖时间的记录
+    LAST_ACTIVE_MAX_TRACKED = 100000
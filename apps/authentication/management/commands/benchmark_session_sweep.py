@@ -0,0 +1,139 @@
+import statistics
+import time
+
+from authentication.constants import AuthConstants
+from authentication.services.session import SessionService
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from redis.exceptions import ResponseError
+
+
+class Command(BaseCommand):
+    help = (
+        "写入大量会话后按过期索引分批清理, 统计单次脚本调用的耗时, "
+        "会写入测试数据, 需在独立的 Redis 中执行"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=1_000_000)
+        parser.add_argument(
+            "--expired-ratio", type=float, default=0.5, help="已过期会话的比例"
+        )
+        parser.add_argument(
+            "--devices-per-user", type=int, default=2, help="每个用户的设备数量"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=AuthConstants.SESSION_SWEEP_CHUNK_SIZE
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--user-id-base",
+            type=int,
+            default=10**12,
+            help="测试用户 ID 的起始值, 避免与真实数据冲突",
+        )
+
+    def handle(self, *args, **options):
+        client = cache.client.get_client(write=True)
+        start = time.perf_counter()
+        self._populate(options)
+        self.stdout.write(
+            f"populated {options['sessions']} sessions "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        slowlog_config = self._enable_slowlog(client)
+        now = int(time.time())
+        latencies = []
+        total = 0
+        start = time.perf_counter()
+        while True:
+            call_start = time.perf_counter()
+            count = SessionService.sweep_expired(now, options["chunk_size"])
+            latencies.append((time.perf_counter() - call_start) * 1000)
+            total += count
+            if count < options["chunk_size"]:
+                break
+        elapsed = time.perf_counter() - start
+
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        self.stdout.write(
+            f"swept={total} calls={len(latencies)} elapsed={elapsed:.2f}s "
+            f"call p50={quantiles[49]:.3f}ms p99={quantiles[98]:.3f}ms "
+            f"max={max(latencies):.3f}ms (client side, including network)"
+        )
+
+        if slowlog_config is not None:
+            entries = client.slowlog_get(1024)
+            self._restore_slowlog(client, slowlog_config)
+            durations = [
+                entry["duration"]
+                for entry in entries
+                if b"EVALSHA" in entry["command"].upper()
+            ]
+            if durations:
+                self.stdout.write(
+                    f"redis slowlog: longest sweep call {max(durations) / 1000:.3f}ms"
+                )
+            else:
+                self.stdout.write("redis slowlog: no sweep call took over 0.1ms")
+
+    def _populate(self, options):
+        client = cache.client.get_client(write=True)
+        now = int(time.time())
+        expired_every = (
+            round(1 / options["expired_ratio"]) if options["expired_ratio"] else 0
+        )
+        index_key = cache.make_key(AuthConstants.SYSTEM_USER_SESSION_EXPIRY)
+        active_key = cache.make_key(AuthConstants.SYSTEM_USER_ACTIVE)
+
+        for batch_start in range(0, options["sessions"], options["batch_size"]):
+            pipe = client.pipeline(transaction=False)
+            index = {}
+            batch_end = min(batch_start + options["batch_size"], options["sessions"])
+            for i in range(batch_start, batch_end):
+                user_id = options["user_id_base"] + i // options["devices_per_user"]
+                device_id = f"benchmark{i}"
+                expired = expired_every and i % expired_every == 0
+                # 未过期的会话 10 分钟后由 TTL 删除, 索引在之后的清理中移除
+                expired_at = now - 60 if expired else now + 600
+                session_key = cache.make_key(SessionService.get_key(user_id, device_id))
+                pipe.hset(
+                    session_key,
+                    mapping={
+                        "refresh_expired_time": expired_at,
+                        "access_expired_time": expired_at,
+                    },
+                )
+                pipe.expire(session_key, 600)
+                pipe.sadd(
+                    cache.make_key(
+                        AuthConstants.SYSTEM_USER_SESSIONS_TEMPLATE.format(
+                            user_id=user_id
+                        )
+                    ),
+                    device_id,
+                )
+                pipe.sadd(active_key, user_id)
+                index[f"{user_id}:{device_id}"] = expired_at
+            pipe.zadd(index_key, index)
+            pipe.execute()
+
+    @staticmethod
+    def _enable_slowlog(client):
+        """
+        记录超过 0.1ms 的命令, 不支持 CONFIG 命令时(如托管的 Redis)跳过
+        """
+        try:
+            config = client.config_get("slowlog-*")
+            client.config_set("slowlog-log-slower-than", 100)
+            client.config_set("slowlog-max-len", 1024)
+            client.slowlog_reset()
+        except ResponseError:
+            return None
+        return config
+
+    @staticmethod
+    def _restore_slowlog(client, config):
+        for key, value in config.items():
+            client.config_set(key, value)
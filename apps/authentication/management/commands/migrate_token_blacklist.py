@@ -0,0 +1,27 @@
+from authentication.constants import AuthConstants
+from authentication.services.blacklist import TokenBlacklistService
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "将升级前以 ZSET 存储的 token 黑名单迁移到按过期时间分桶的黑名单, 已过期的 token 直接丢弃, "
+        "迁移前仍会检查旧的黑名单, 需在所有旧版本的进程停止后执行, 否则之后写入旧黑名单的 token 会丢失"
+    )
+
+    def handle(self, *args, **options):
+        now = timezone.now().timestamp()
+        for legacy_key, template in (
+            (AuthConstants.LEGACY_ACCESS_TOKEN_BLACKLIST, TokenBlacklistService.ACCESS),
+            (
+                AuthConstants.LEGACY_REFRESH_TOKEN_BLACKLIST,
+                TokenBlacklistService.REFRESH,
+            ),
+        ):
+            tokens = cache.zrangebyscore(legacy_key, now, "+inf", withscores=True)
+            for token, exp in tokens:
+                TokenBlacklistService.add(template, token, exp)
+            cache.delete(legacy_key)
+            self.stdout.write(f"{legacy_key}: migrated {len(tokens)} tokens")
@@ -0,0 +1,38 @@
+from authentication.constants import AuthConstants
+from authentication.services.session import SessionService
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "根据现有会话重建会话过期索引, 通过 SSCAN 和 pipeline 分批读取, 不会长时间阻塞 Redis"
+
+    def handle(self, *args, **options):
+        client = cache.client.get_client(write=True)
+        index_key = cache.make_key(AuthConstants.SYSTEM_USER_SESSION_EXPIRY)
+
+        indexed = 0
+        for user_id in client.sscan_iter(
+            cache.make_key(AuthConstants.SYSTEM_USER_ACTIVE), count=500
+        ):
+            user_id = user_id.decode()
+            device_ids = SessionService.get_device_ids(user_id)
+            if not device_ids:
+                continue
+
+            pipe = cache.pipeline()
+            for device_id in device_ids:
+                pipe.hmget(
+                    cache.make_key(SessionService.get_key(user_id, device_id)),
+                    "refresh_expired_time",
+                    "access_expired_time",
+                )
+            # 会话已不存在时过期时间为 0, 下次清理时移除
+            mapping = {
+                f"{user_id}:{device_id}": max(int(value or 0) for value in values)
+                for device_id, values in zip(device_ids, pipe.execute())
+            }
+            client.zadd(index_key, mapping)
+            indexed += len(mapping)
+
+        self.stdout.write(f"indexed {indexed} sessions")
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.utils import timezone
+
+# 黑名单改为按过期时间分桶并自动过期后删除的任务
+# DatabaseScheduler 不会删除 beat_schedule 中已移除的定时任务, 需要手动删除
+REMOVED_TASKS = ("clean_expiration_access_token", "clean_expiration_refresh_token")
+
+
+def remove_periodic_tasks(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTasks = apps.get_model("django_celery_beat", "PeriodicTasks")
+
+    deleted, _ = PeriodicTask.objects.filter(task__in=REMOVED_TASKS).delete()
+    if deleted:
+        # 迁移中的模型不会触发信号, 手动更新变更时间, 通知 beat 重新加载
+        PeriodicTasks.objects.update_or_create(
+            ident=1, defaults={"last_update": timezone.now()}
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_periodic_tasks, migrations.RunPython.noop),
+    ]
@@ -6,14 +6,12 @@ from common.exceptions import ApplicationException
 from common.header import HeaderUtil
 from common.services.sms import SMSService
 from common.validators import ValidationMessages
-from django.core.cache import cache
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .constants import AuthConstants
+from .services.blacklist import TokenBlacklistService
 from .services.mfa import MFAService
 
 
@@ -120,8 +118,9 @@ class TokenRefreshInputSerializer(serializers.Serializer):
         except TokenError:
             raise AuthenticationFailed(_("refresh token decode error")) from TokenError
 
-        value = cache.zscore(AuthConstants.REFRESH_TOKEN_BLACKLIST, refresh)
-        if value and value > timezone.now().timestamp():
+        if TokenBlacklistService.contains(
+            TokenBlacklistService.REFRESH, refresh, refresh_token["exp"]
+        ):
             raise AuthenticationFailed(_("refresh token in blacklist"))
 
         return refresh_token
@@ -2,13 +2,12 @@ import uuid
 
 from accounts.models import SystemUser
 from accounts.services.system_user import SystemUserService
-from authentication.constants import AuthConstants
 from authentication.services.mfa import MFAService
+from authentication.services.session import SessionService
 from common.exceptions import ApplicationException
 from common.header import HeaderUtil
 from common.services.ip import IPService
 from common.utils import auto_mask
-from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -122,13 +121,4 @@ class BaseLoginService:
         """
         缓存会话信息
         """
-        device_session_key = AuthConstants.SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
-            user_id=user.id,
-            device_id=device_id,
-        )
-        user_sessions_key = AuthConstants.SYSTEM_USER_ALL_SESSIONS_TEMPLATE.format(
-            user_id=user.id,
-        )
-        cache.set(device_session_key, session_data, timeout=timeout)
-        cache.sadd(user_sessions_key, device_id)
-        cache.sadd(AuthConstants.SYSTEM_USER_ACTIVE, user.id)
+        SessionService.create(user.id, device_id, session_data, timeout)
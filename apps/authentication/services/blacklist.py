@@ -0,0 +1,83 @@
+import time
+from typing import Optional, Set
+
+from authentication.constants import AuthConstants
+from common.revocation import RevocationFilter
+from django.core.cache import cache
+
+
+class TokenBlacklistService:
+    """
+    token 黑名单, 按 token 的过期时间分桶, 每个桶一个 Set, 成员为 token 的 64 位摘要
+    摘要为有符号整数, Redis 以 intset 编码存储, 每个成员只占 8 字节
+    桶内的 token 全部过期后整个桶自动过期, 不需要定时清理
+    升级前的 ZSET 黑名单在迁移(migrate_token_blacklist)前同时检查, ZSET 不存在时不影响结果
+    """
+
+    ACCESS = AuthConstants.ACCESS_TOKEN_BLACKLIST_TEMPLATE
+    REFRESH = AuthConstants.REFRESH_TOKEN_BLACKLIST_TEMPLATE
+    LEGACY = {
+        ACCESS: AuthConstants.LEGACY_ACCESS_TOKEN_BLACKLIST,
+        REFRESH: AuthConstants.LEGACY_REFRESH_TOKEN_BLACKLIST,
+    }
+
+    @staticmethod
+    def get_bucket(exp) -> int:
+        return int(exp) // AuthConstants.BLACKLIST_BUCKET_SECONDS
+
+    @classmethod
+    def get_key(cls, template: str, bucket: int) -> str:
+        return template.format(bucket=bucket)
+
+    @classmethod
+    def add(cls, template: str, token: str, exp, channel: Optional[str] = None) -> int:
+        """
+        将 token 加入黑名单, 桶在其中最晚的 token 过期后过期
+        :param template: 黑名单的键名模板, ACCESS 或 REFRESH
+        :param exp: token 的过期时间戳, 即 payload 中的 exp
+        :param channel: 撤销通知的频道, 与写入通过同一个 pipeline 发布摘要
+        :return: token 的摘要
+        """
+        digest = RevocationFilter.digest(token)
+        bucket = cls.get_bucket(exp)
+        key = cache.make_key(cls.get_key(template, bucket))
+
+        pipe = cache.pipeline()
+        pipe.sadd(key, digest)
+        pipe.expireat(key, (bucket + 1) * AuthConstants.BLACKLIST_BUCKET_SECONDS)
+        if channel is not None:
+            pipe.publish(cache.make_key(channel), str(digest))
+        pipe.execute()
+        return digest
+
+    @classmethod
+    def contains(cls, template: str, token: str, exp) -> bool:
+        """
+        token 是否在黑名单中, 查询其过期时间所在的桶和升级前的黑名单, 通过一个 pipeline 发送
+        token 本身是否过期由 JWT 校验负责, 这里不再判断
+        """
+        pipe = cache.pipeline()
+        pipe.sismember(
+            cache.make_key(cls.get_key(template, cls.get_bucket(exp))),
+            RevocationFilter.digest(token),
+        )
+        # 升级前的成员为序列化后的 token
+        pipe.zscore(cache.make_key(cls.LEGACY[template]), cache.client.encode(token))
+        in_bucket, legacy_exp = pipe.execute()
+        return bool(in_bucket) or bool(legacy_exp and legacy_exp > time.time())
+
+    @classmethod
+    def get_digests(cls, template: str, start, end) -> Set[int]:
+        """
+        获取过期时间在 [start, end] 所在的桶中的所有摘要, 用于进程内过滤器的全量同步
+        包括升级前的黑名单中未过期的 token
+        """
+        pipe = cache.pipeline()
+        for bucket in range(cls.get_bucket(start), cls.get_bucket(end) + 1):
+            pipe.smembers(cache.make_key(cls.get_key(template, bucket)))
+        digests = {int(digest) for members in pipe.execute() for digest in members}
+        digests.update(
+            RevocationFilter.digest(token)
+            for token in cache.zrangebyscore(cls.LEGACY[template], start, "+inf")
+        )
+        return digests
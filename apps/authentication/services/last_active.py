@@ -0,0 +1,59 @@
+import threading
+import time
+from typing import Dict
+
+from authentication.constants import AuthConstants
+from authentication.services.session import SessionService
+
+
+class LastActiveService:
+    """
+    设备会话的上次活跃时间, 只写入会话 Hash 中的时间戳字段, 不读写其他会话数据
+    同一进程内每个设备最多每 LAST_ACTIVE_DEBOUNCE_SECONDS 秒写入一次
+    """
+
+    _last_written: Dict[tuple, float] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def touch(cls, user_id, device_id) -> bool:
+        """
+        记录设备活跃, 距离上次写入未超过去抖时间时跳过
+        :return: 是否写入了 Redis
+        """
+        now = time.monotonic()
+        key = (user_id, device_id)
+        last_written = cls._last_written.get(key)
+        if (
+            last_written is not None
+            and now - last_written < AuthConstants.LAST_ACTIVE_DEBOUNCE_SECONDS
+        ):
+            return False
+
+        with cls._lock:
+            if len(cls._last_written) >= AuthConstants.LAST_ACTIVE_MAX_TRACKED:
+                cls._prune(now)
+            cls._last_written[key] = now
+
+        cls.save(user_id, device_id, int(time.time()))
+        return True
+
+    @classmethod
+    def _prune(cls, now: float):
+        expired = [
+            key
+            for key, last_written in cls._last_written.items()
+            if now - last_written >= AuthConstants.LAST_ACTIVE_DEBOUNCE_SECONDS
+        ]
+        for key in expired:
+            del cls._last_written[key]
+        if len(cls._last_written) >= AuthConstants.LAST_ACTIVE_MAX_TRACKED:
+            # 去抖时间内的活跃设备过多, 直接清空, 最多多写一次
+            cls._last_written.clear()
+
+    @staticmethod
+    def save(user_id, device_id, timestamp: int):
+        """
+        写入会话 Hash 中的上次活跃时间字段, 会话不存在时不写入
+        """
+        SessionService.touch(user_id, device_id, timestamp)
@@ -0,0 +1,354 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from authentication.constants import AuthConstants
+from django.core.cache import cache
+
+
+class SessionService:
+    """
+    设备会话, 以 Hash 形式存储, 字段均为字符串或整数, 可以按字段读写, Lua 脚本中也可以直接读取
+    用户的设备 ID 集合和活跃用户集合中的成员同样不经过序列化
+    """
+
+    DEVICE_INFO_FIELDS = (
+        "device_id",
+        "user_agent",
+        "device_family",
+        "device_brand",
+        "device_model",
+        "device_type",
+        "os_family",
+        "os_version",
+        "browser_family",
+        "browser_version",
+    )
+    INT_FIELDS = (
+        "refresh_expired_second",
+        "access_expired_second",
+        "refresh_expired_time",
+        "access_expired_time",
+    )
+    # 以时间戳存储, 读取时转换为 datetime
+    DATETIME_FIELDS = ("login_at", "last_active_at")
+
+    # KEYS[1]: 会话 Hash
+    # ARGV[1]: refresh token, ARGV[2]: 新的 access token
+    # ARGV[3]: access 有效期(秒), ARGV[4]: access 过期时间戳
+    # 返回 {0}: 会话不存在, {-1}: refresh token 不匹配, {1, 旧 access, 旧 access 过期时间戳}: 已替换
+    ROTATE_ACCESS_SCRIPT = """
+    local session = redis.call("HMGET", KEYS[1], "refresh", "access", "access_expired_time")
+    if not session[1] then
+        return {0}
+    end
+    if session[1] ~= ARGV[1] then
+        return {-1}
+    end
+    redis.call(
+        "HSET", KEYS[1],
+        "access", ARGV[2],
+        "access_expired_second", ARGV[3],
+        "access_expired_time", ARGV[4]
+    )
+    return {1, session[2], session[3]}
+    """
+
+    # KEYS[1]: 会话 Hash, ARGV[1]: 上次活跃时间戳
+    # 会话不存在(已退出或过期)时不写入, 避免生成不完整的会话
+    TOUCH_SCRIPT = """
+    if redis.call("EXISTS", KEYS[1]) == 1 then
+        redis.call("HSET", KEYS[1], "last_active_at", ARGV[1])
+        return 1
+    end
+    return 0
+    """
+
+    # KEYS[1]: 过期索引, KEYS[2]: 活跃用户集合
+    # ARGV[1]: 当前时间戳, ARGV[2]: 最多处理的数量
+    # ARGV[3]: 用户设备集合的键名模板, ARGV[4]: 会话的键名模板, 均已包含缓存前缀
+    # 返回本次处理的索引成员数量
+    SWEEP_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local members = redis.call(
+        "ZRANGEBYSCORE", KEYS[1], "-inf", now, "LIMIT", 0, tonumber(ARGV[2])
+    )
+    for _, member in ipairs(members) do
+        local sep = string.find(member, ":", 1, true)
+        local user_id = string.sub(member, 1, sep - 1)
+        local device_id = string.sub(member, sep + 1)
+        local session_key = string.format(ARGV[4], user_id, device_id)
+        local expired_times = redis.call(
+            "HMGET", session_key, "refresh_expired_time", "access_expired_time"
+        )
+        local expired_at = math.max(
+            tonumber(expired_times[1] or 0) or 0, tonumber(expired_times[2] or 0) or 0
+        )
+
+        if expired_at > now then
+            -- 索引中的过期时间落后于会话, 以会话为准
+            redis.call("ZADD", KEYS[1], expired_at, member)
+        else
+            local user_sessions_key = string.format(ARGV[3], user_id)
+            redis.call("DEL", session_key)
+            redis.call("SREM", user_sessions_key, device_id)
+            redis.call("ZREM", KEYS[1], member)
+            if redis.call("SCARD", user_sessions_key) == 0 then
+                redis.call("SREM", KEYS[2], user_id)
+            end
+        end
+    end
+    return #members
+    """
+
+    ROTATE_OK = 1
+    ROTATE_NOT_FOUND = 0
+    ROTATE_MISMATCH = -1
+
+    @staticmethod
+    def get_key(user_id, device_id) -> str:
+        return AuthConstants.SYSTEM_USER_SESSION_TEMPLATE.format(
+            user_id=user_id, device_id=device_id
+        )
+
+    @classmethod
+    def to_fields(cls, session_data: dict) -> Dict[str, str]:
+        """
+        将会话数据转换为 Hash 字段, device_info 展开为同级字段, 时间转换为时间戳
+        """
+        fields = {}
+        for key, value in session_data.items():
+            if key == "device_info":
+                for field in cls.DEVICE_INFO_FIELDS:
+                    fields[field] = value.get(field) or ""
+            elif key in cls.DATETIME_FIELDS:
+                fields[key] = str(int(value.timestamp())) if value else ""
+            else:
+                fields[key] = "" if value is None else str(value)
+        return fields
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, bytes]) -> Optional[dict]:
+        """
+        将 Hash 字段还原为会话数据, 与 to_fields 的输入格式一致
+        """
+        if not fields:
+            return None
+
+        values = {key: value.decode() for key, value in fields.items()}
+        session_data = {
+            "device_info": {
+                field: values.pop(field, "") for field in cls.DEVICE_INFO_FIELDS
+            }
+        }
+        for key, value in values.items():
+            if key in cls.INT_FIELDS:
+                session_data[key] = int(value) if value else None
+            elif key in cls.DATETIME_FIELDS:
+                session_data[key] = (
+                    datetime.fromtimestamp(int(value), timezone.utc) if value else None
+                )
+            else:
+                session_data[key] = value
+        return session_data
+
+    @classmethod
+    def create(cls, user_id, device_id, session_data: dict, timeout: int):
+        """
+        保存会话并写入过期索引, 过期时间与 refresh token 的有效期一致
+        """
+        session_key = cache.make_key(cls.get_key(user_id, device_id))
+        expired_at = max(
+            session_data["refresh_expired_time"], session_data["access_expired_time"]
+        )
+        pipe = cache.pipeline()
+        pipe.hset(session_key, mapping=cls.to_fields(session_data))
+        pipe.expire(session_key, timeout)
+        pipe.sadd(
+            cache.make_key(
+                AuthConstants.SYSTEM_USER_SESSIONS_TEMPLATE.format(user_id=user_id)
+            ),
+            device_id,
+        )
+        pipe.sadd(cache.make_key(AuthConstants.SYSTEM_USER_ACTIVE), user_id)
+        pipe.zadd(
+            cache.make_key(AuthConstants.SYSTEM_USER_SESSION_EXPIRY),
+            {f"{user_id}:{device_id}": expired_at},
+        )
+        pipe.execute()
+
+    @classmethod
+    def get(cls, user_id, device_id) -> Optional[dict]:
+        return cls.from_fields(cache.hgetall(cls.get_key(user_id, device_id), raw=True))
+
+    @classmethod
+    def get_many(cls, user_id, device_ids: List[str]) -> Dict[str, dict]:
+        """
+        通过一次 pipeline 获取用户多个设备的会话, 不存在的会话会被忽略
+        """
+        pipe = cache.pipeline()
+        for device_id in device_ids:
+            pipe.hgetall(cache.make_key(cls.get_key(user_id, device_id)))
+        return {
+            device_id: session_data
+            for device_id, raw_values in zip(device_ids, pipe.execute())
+            if (
+                session_data := cls.from_fields(
+                    {key.decode(): value for key, value in raw_values.items()}
+                )
+            )
+            is not None
+        }
+
+    @staticmethod
+    def get_device_ids(user_id) -> List[str]:
+        return [
+            device_id.decode()
+            for device_id in cache.smembers(
+                AuthConstants.SYSTEM_USER_SESSIONS_TEMPLATE.format(user_id=user_id),
+                raw=True,
+            )
+        ]
+
+    @classmethod
+    def rotate_access(
+        cls,
+        user_id,
+        device_id,
+        refresh: str,
+        access: str,
+        access_expired_second: int,
+        access_expired_time: int,
+    ):
+        """
+        refresh token 与会话中的一致时原子地替换 access token
+        :return: (状态, 旧 access token, 旧 access 过期时间戳), 状态见 ROTATE_*
+        """
+        result = cache.execute_script(
+            cls.ROTATE_ACCESS_SCRIPT,
+            keys=[cls.get_key(user_id, device_id)],
+            args=[refresh, access, access_expired_second, access_expired_time],
+        )
+        if result[0] != cls.ROTATE_OK:
+            return result[0], None, None
+        return cls.ROTATE_OK, result[1].decode(), int(result[2])
+
+    @classmethod
+    def touch(cls, user_id, device_id, timestamp: int) -> bool:
+        """
+        更新上次活跃时间, 只写入 last_active_at 字段
+        """
+        return bool(
+            cache.execute_script(
+                cls.TOUCH_SCRIPT,
+                keys=[cls.get_key(user_id, device_id)],
+                args=[timestamp],
+            )
+        )
+
+    @classmethod
+    def delete(cls, user_id, device_id):
+        """
+        删除会话, 用户没有其他会话时从活跃用户集合中移除
+        """
+        user_sessions_key = AuthConstants.SYSTEM_USER_SESSIONS_TEMPLATE.format(
+            user_id=user_id
+        )
+        pipe = cache.pipeline()
+        pipe.delete(cache.make_key(cls.get_key(user_id, device_id)))
+        pipe.srem(cache.make_key(user_sessions_key), device_id)
+        pipe.zrem(
+            cache.make_key(AuthConstants.SYSTEM_USER_SESSION_EXPIRY),
+            f"{user_id}:{device_id}",
+        )
+        pipe.scard(cache.make_key(user_sessions_key))
+        if not pipe.execute()[-1]:
+            cache.srem(AuthConstants.SYSTEM_USER_ACTIVE, user_id)
+
+    @classmethod
+    def sweep_expired(cls, now: int, count: int) -> int:
+        """
+        清理过期索引中最多 count 个已过期的会话
+        :return: 处理的索引成员数量, 小于 count 时表示已清理完
+        """
+        return cache.execute_script(
+            cls.SWEEP_SCRIPT,
+            keys=[
+                AuthConstants.SYSTEM_USER_SESSION_EXPIRY,
+                AuthConstants.SYSTEM_USER_ACTIVE,
+            ],
+            args=[
+                now,
+                count,
+                # 键名模板中的占位符替换为 %s, 由脚本中的 string.format 填充
+                cache.make_key(
+                    AuthConstants.SYSTEM_USER_SESSIONS_TEMPLATE.format(user_id="%s")
+                ),
+                cache.make_key(
+                    AuthConstants.SYSTEM_USER_SESSION_TEMPLATE.format(
+                        user_id="%s", device_id="%s"
+                    )
+                ),
+            ],
+        )
+
+    @classmethod
+    def sweep(
+        cls,
+        chunk_size: int = AuthConstants.SESSION_SWEEP_CHUNK_SIZE,
+        time_budget: float = AuthConstants.SESSION_SWEEP_TIME_BUDGET,
+    ) -> int:
+        """
+        分批清理已过期的会话, 超过 time_budget 秒后停止, 剩余的留到下次
+        :return: 处理的索引成员数量
+        """
+        now = int(time.time())
+        deadline = time.monotonic() + time_budget
+        total = 0
+        while True:
+            count = cls.sweep_expired(now, chunk_size)
+            total += count
+            if count < chunk_size or time.monotonic() >= deadline:
+                return total
+
+    @classmethod
+    def migrate_legacy(cls, user_id, device_id) -> bool:
+        """
+        将升级前以序列化字典存储的会话转换为 Hash, 剩余过期时间保持不变
+        :return: 是否存在旧格式的会话
+        """
+        legacy_key = AuthConstants.LEGACY_SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
+            user_id=user_id, device_id=device_id
+        )
+        session_data = cache.get(legacy_key)
+        timeout = cache.ttl(legacy_key)
+        if not session_data or not timeout:
+            return False
+
+        cls.create(user_id, device_id, session_data, timeout)
+        cache.delete(legacy_key)
+        cache.srem(
+            AuthConstants.LEGACY_SYSTEM_USER_ALL_SESSIONS_TEMPLATE.format(
+                user_id=user_id
+            ),
+            device_id,
+        )
+        return True
+
+    @classmethod
+    def migrate_legacy_user(cls, user_id) -> int:
+        """
+        转换用户所有旧格式的会话, 之后删除旧的设备 ID 集合
+        :return: 转换的会话数量
+        """
+        legacy_sessions_key = (
+            AuthConstants.LEGACY_SYSTEM_USER_ALL_SESSIONS_TEMPLATE.format(
+                user_id=user_id
+            )
+        )
+        migrated = sum(
+            cls.migrate_legacy(user_id, device_id)
+            for device_id in cache.smembers(legacy_sessions_key)
+        )
+        cache.delete(legacy_sessions_key)
+        return migrated
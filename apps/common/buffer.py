@@ -0,0 +1,184 @@
+import atexit
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, List
+
+from loguru import logger
+
+
+class OverflowPolicy:
+    DROP_OLDEST = "drop_oldest"  # 丢弃最旧的记录
+    DROP_NEW = "drop_new"  # 丢弃新写入的记录
+    BLOCK = "block"  # 阻塞等待, 超时后丢弃新写入的记录
+    CHOICES = (DROP_OLDEST, DROP_NEW, BLOCK)
+
+
+class BufferedQueueWriter:
+    """
+    进程内有界缓冲区, 由后台线程按数量或时间间隔批量 flush
+    每个进程一个实例, fork 后会在子进程中重新初始化
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[List[Any]], Any],
+        max_size: int = 10000,
+        flush_size: int = 200,
+        flush_interval: float = 1.0,
+        overflow_policy: str = OverflowPolicy.DROP_OLDEST,
+        block_timeout: float = 0.1,
+    ):
+        """
+        :param name: 缓冲区名称, 用于日志
+        :param flush_func: 批量写入函数, 接收一个记录列表
+        :param max_size: 缓冲区最大记录数
+        :param flush_size: 达到该数量时立即 flush
+        :param flush_interval: flush 的最大时间间隔, 单位为秒
+        :param overflow_policy: 缓冲区满时的处理策略
+        :param block_timeout: BLOCK 策略下的最长等待时间, 单位为秒
+        """
+        if overflow_policy not in OverflowPolicy.CHOICES:
+            raise ValueError(f"Invalid overflow policy: {overflow_policy}")
+
+        self.name = name
+        self.flush_func = flush_func
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+
+        self._logger = logger.bind(component=f"Buffer:{name}")
+        self._atexit_registered = False
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+        self.buffered_count = 0
+        self.flushed_count = 0
+        self.dropped_count = 0
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # fork 后的子进程, 父进程的锁和线程不可用, 缓冲的数据由父进程负责
+            self._reset()
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run, name=f"buffer-flusher-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def put(self, item: Any) -> bool:
+        """
+        写入一条记录, 返回是否写入成功
+        """
+        self._ensure_started()
+
+        with self._lock:
+            if len(self._buffer) >= self.max_size:
+                if self.overflow_policy == OverflowPolicy.DROP_NEW:
+                    self.dropped_count += 1
+                    return False
+
+                if self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                    self._buffer.popleft()
+                    self.dropped_count += 1
+                else:
+                    self._not_empty.notify()
+                    self._not_full.wait_for(
+                        lambda: len(self._buffer) < self.max_size,
+                        timeout=self.block_timeout,
+                    )
+                    if len(self._buffer) >= self.max_size:
+                        self.dropped_count += 1
+                        return False
+
+            self._buffer.append(item)
+            self.buffered_count += 1
+
+            if len(self._buffer) >= self.flush_size:
+                self._not_empty.notify()
+
+        return True
+
+    def flush(self):
+        """
+        将缓冲区中的记录全部写出
+        """
+        if self._pid != os.getpid():
+            return
+
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        return
+                    size = min(self.flush_size, len(self._buffer))
+                    batch = [self._buffer.popleft() for _ in range(size)]
+                    self._not_full.notify_all()
+
+                try:
+                    self.flush_func(batch)
+                except Exception as e:
+                    with self._lock:
+                        self.dropped_count += len(batch)
+                    self._logger.error(f"Flush {len(batch)} records failed: {e}")
+                    return
+
+                with self._lock:
+                    self.flushed_count += len(batch)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopped and len(self._buffer) < self.flush_size:
+                    self._not_empty.wait(timeout=self.flush_interval)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def close(self):
+        """
+        停止后台线程并写出剩余记录, 在进程退出时调用
+        """
+        if self._pid != os.getpid():
+            return
+
+        with self._lock:
+            self._stopped = True
+            self._not_empty.notify_all()
+
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 1)
+
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._buffer),
+                "buffered": self.buffered_count,
+                "flushed": self.flushed_count,
+                "dropped": self.dropped_count,
+            }
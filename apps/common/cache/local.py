@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from common.subscriber import ChannelSubscriber
+
+
+class LocalCache(ChannelSubscriber):
+    """
+    进程内的 TTL + LRU 缓存, 作为 Redis 缓存前的一级缓存
+    数据修改后通过频道广播键名, 各进程的订阅线程收到后删除本地缓存
+    订阅未就绪或中断时可能错过失效通知, 此时不读写本地缓存, 重新订阅后清空
+    """
+
+    def __init__(
+        self,
+        name: str,
+        channel: str,
+        max_size: int = 10000,
+        timeout: float = 60.0,
+        retry_interval: float = 5.0,
+    ):
+        """
+        :param name: 名称, 用于日志
+        :param channel: 失效通知的频道, 消息内容为键名
+        :param max_size: 最多缓存的键数量, 超过后淘汰最久未使用的
+        :param timeout: 缓存时间, 单位为秒, 失效通知丢失时最多在该时间内读到旧数据
+        :param retry_interval: 订阅失败后重试的时间间隔, 单位为秒
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        super().__init__(name, channel, retry_interval)
+
+    def _reset(self):
+        super()._reset()
+        self._data: OrderedDict = OrderedDict()
+        self._data_lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        每次失效时递增, 从 Redis 读取前获取, 写入本地缓存时传入
+        读取期间发生过失效时不写入, 避免缓存读取到的旧数据
+        """
+        return self._generation
+
+    def get(self, key: str) -> Optional[Any]:
+        self._ensure_started()
+        if not self._ready:
+            return None
+
+        with self._data_lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, generation: int):
+        if not self._ready:
+            return
+
+        with self._data_lock:
+            if generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._data_lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._data_lock:
+            self._generation += 1
+            self._data.clear()
+
+    def on_subscribe(self):
+        self.clear()
+
+    def on_message(self, data: bytes):
+        self.delete(data.decode())
+
+    def on_disconnect(self):
+        self.clear()
+
+    def stats(self) -> dict:
+        return {"ready": self._ready, "size": len(self._data)}
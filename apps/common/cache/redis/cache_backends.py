@@ -1,12 +1,47 @@
 import copy
-from typing import Any, List, Optional, Union
+from typing import Any, Callable, List, Optional, Union
 
 from django_redis.cache import RedisCache, omit_exception
 
 
 class ExtendedRedisCache(RedisCache):
+    # KEYS[1]: 源队列, KEYS[2]: processing 队列
+    # ARGV[1]: 最多移动的数量, ARGV[2]: 是否优先返回未确认的数据
+    DRAIN_SCRIPT = """
+    if ARGV[2] == "1" then
+        local pending = redis.call("LRANGE", KEYS[2], 0, -1)
+        if #pending > 0 then
+            return pending
+        end
+    end
+
+    local items = redis.call("LRANGE", KEYS[1], -tonumber(ARGV[1]), -1)
+    if #items == 0 then
+        return items
+    end
+
+    redis.call("LTRIM", KEYS[1], 0, -#items - 1)
+    -- unpack 参数数量有限制, 分块写入
+    for i = 1, #items, 1000 do
+        redis.call("RPUSH", KEYS[2], unpack(items, i, math.min(i + 999, #items)))
+    end
+    return items
+    """
+
+    # 将 KEYS[1] 中的数据全部移动到 KEYS[2] 的尾部并删除 KEYS[1], 返回移动的数量
+    MOVE_ALL_SCRIPT = """
+    local items = redis.call("LRANGE", KEYS[1], 0, -1)
+    for i = 1, #items, 1000 do
+        redis.call("RPUSH", KEYS[2], unpack(items, i, math.min(i + 999, #items)))
+    end
+    redis.call("DEL", KEYS[1])
+    return #items
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._drain_script = None
+        self._scripts = {}
 
     def _make_key(self, key: str):
         return self.make_key(key, version=self.version)
@@ -21,6 +56,22 @@ class ExtendedRedisCache(RedisCache):
             return value
         return self.client.decode(value)
 
+    @omit_exception
+    def get_raw(self, name: str) -> Optional[bytes]:
+        """
+        读取 set_raw 写入的值, 不经过反序列化和解压
+        """
+        return self.client.get_client(write=False).get(self._make_key(name))
+
+    @omit_exception
+    def set_raw(self, name: str, value: bytes, timeout: int):
+        """
+        写入已编码的 bytes, 不经过序列化和压缩
+        """
+        return self.client.get_client(write=True).set(
+            self._make_key(name), value, ex=timeout
+        )
+
     @omit_exception
     def hset(
         self,
@@ -62,16 +113,72 @@ class ExtendedRedisCache(RedisCache):
         return [self._decode_value(value) for value in raw_values]
 
     @omit_exception
-    def hgetall(self, name: str):
+    def hgetall(self, name: str, raw: bool = False):
         raw_values = self.client.get_client(write=False).hgetall(self._make_key(name))
+        if raw:
+            return {k.decode("utf-8"): v for k, v in raw_values.items()}
         return {k.decode("utf-8"): self._decode_value(v) for k, v in raw_values.items()}
 
+    @omit_exception
+    def hset_with_ttl(
+        self,
+        name: str,
+        mapping: dict,
+        timeout: int,
+        channel: Optional[str] = None,
+        message: Union[str, bytes] = b"",
+    ):
+        """
+        HSET + EXPIRE, 可选 PUBLISH, 通过一个 pipeline 发送, 只需一次网络往返
+        mapping 的值需为 str 或 bytes, 不经过序列化和压缩
+        """
+        full_name = self._make_key(name)
+        pipe = self.client.get_client(write=True).pipeline(transaction=False)
+        pipe.hset(full_name, mapping=mapping)
+        pipe.expire(full_name, timeout)
+        if channel is not None:
+            pipe.publish(self._make_key(channel), message)
+        return pipe.execute()
+
+    @omit_exception
+    def publish(self, channel: str, message: Union[str, bytes]):
+        return self.client.get_client(write=True).publish(
+            self._make_key(channel), message
+        )
+
+    def pubsub(self, *channels: str):
+        """
+        订阅频道, 返回 redis-py 的 PubSub 对象, 使用后需要调用 close()
+        """
+        pubsub = self.client.get_client(write=False).pubsub(
+            ignore_subscribe_messages=True
+        )
+        if channels:
+            pubsub.subscribe(*[self._make_key(channel) for channel in channels])
+        return pubsub
+
     @omit_exception
     def lpush(self, name: str, *values):
         full_name = self._make_key(name)
         encoded_values = [self._encode_value(value) for value in values]
         return self.client.get_client(write=True).lpush(full_name, *encoded_values)
 
+    @omit_exception
+    def lpush_many(
+        self, name: str, values: List, chunk_size: int = 500, raw: bool = False
+    ):
+        """
+        分块 LPUSH, 所有分块通过一个 pipeline 发送, 只需一次网络往返
+        raw 为 True 时 values 需为已编码的 bytes, 不再经过序列化和压缩
+        """
+        full_name = self._make_key(name)
+        if not raw:
+            values = [self._encode_value(value) for value in values]
+        pipe = self.client.get_client(write=True).pipeline(transaction=False)
+        for i in range(0, len(values), chunk_size):
+            pipe.lpush(full_name, *values[i : i + chunk_size])
+        return pipe.execute()
+
     @omit_exception
     def rpush(self, name: str, *values):
         full_name = self._make_key(name)
@@ -90,6 +197,90 @@ class ExtendedRedisCache(RedisCache):
             self.client.get_client(write=True).rpop(self._make_key(name))
         )
 
+    @omit_exception
+    def drain(
+        self,
+        name: str,
+        processing_name: str,
+        count: int,
+        resume: bool = True,
+        raw: bool = False,
+    ):
+        """
+        从队列尾部取出最多 count 条数据, 原子地移动到 processing 队列并返回
+        resume 为 True 且 processing 队列不为空时(上次处理失败或进程崩溃), 直接返回其中的数据
+        resume 为 False 时追加到 processing 队列, 用于分多次累积一批数据
+        raw 为 True 时返回未解码的 bytes
+        数据处理成功后需要调用 ack 删除 processing 队列
+        """
+        if self._drain_script is None:
+            self._drain_script = self.client.get_client(write=True).register_script(
+                self.DRAIN_SCRIPT
+            )
+        raw_values = self._drain_script(
+            keys=[self._make_key(name), self._make_key(processing_name)],
+            args=[count, 1 if resume else 0],
+            client=self.client.get_client(write=True),
+        )
+        if raw:
+            return raw_values
+        return [self._decode_value(value) for value in raw_values]
+
+    def drain_records(
+        self,
+        name: str,
+        processing_name: str,
+        count: int,
+        decode: Callable[[bytes], list],
+        max_per_entry: int,
+        resume: bool = True,
+    ) -> list:
+        """
+        按记录数取出数据, 用于每个队列元素打包了多条记录的队列, 循环 drain 直到记录数达到 count 或队列为空
+        第一次按每个元素最多 max_per_entry 条取出, 之后按已取出元素的平均条数估算剩余需要的元素数量
+        只有第一次 drain 使用 resume, 之后的数据追加到 processing 队列
+        :param decode: 将一个队列元素解码为记录列表
+        :param max_per_entry: 每个队列元素最多打包的记录数
+        :return: 记录列表, 最后一次取出的元素可能使记录数略超过 count
+        """
+        records = []
+        entry_count = 0
+        size = max(-(-count // max_per_entry), 1)
+        while True:
+            entries = self.drain(
+                name,
+                processing_name,
+                size,
+                resume=resume and not entry_count,
+                raw=True,
+            )
+            if not entries:
+                return records
+            for entry in entries:
+                records.extend(decode(entry))
+            entry_count += len(entries)
+
+            remaining = count - len(records)
+            if len(entries) < size or remaining <= 0:
+                return records
+            # 每个元素至少一条记录, 估算的元素数量不会超过剩余的记录数
+            size = max(-(-remaining * entry_count // len(records)), 1)
+
+    @omit_exception
+    def ack(self, processing_name: str):
+        """确认 processing 队列中的数据已处理完成"""
+        return self.client.get_client(write=True).delete(
+            self._make_key(processing_name)
+        )
+
+    def move_all(self, src: str, dst: str) -> int:
+        """
+        原子地将 src 队列中的数据全部移动到 dst 队列的尾部(最先被 drain 取出), 并删除 src
+        用于将未确认的 processing 队列放回主队列或移动到死信队列
+        :return: 移动的数量
+        """
+        return self.execute_script(self.MOVE_ALL_SCRIPT, keys=[src, dst])
+
     @omit_exception
     def llen(self, name: str):
         return self.client.get_client(write=False).llen(self._make_key(name))
@@ -130,23 +321,26 @@ class ExtendedRedisCache(RedisCache):
         return self.client.get_client(write=True).brpop(full_keys, timeout)
 
     @omit_exception
-    def brpoplpush(self, src: str, dst: str, timeout: int = 0):
-        return self.client.get_client(write=True).brpoplpush(
+    def brpoplpush(self, src: str, dst: str, timeout: int = 0, raw: bool = False):
+        raw_value = self.client.get_client(write=True).brpoplpush(
             self._make_key(src), self._make_key(dst), timeout
         )
+        if raw:
+            return raw_value
+        return self._decode_value(raw_value)
 
     # Set
     @omit_exception
-    def sadd(self, name: str, *values):
-        return self.client.get_client(write=True).sadd(
-            self._make_key(name), *[self._encode_value(value) for value in values]
-        )
+    def sadd(self, name: str, *values, raw: bool = False):
+        if not raw:
+            values = [self._encode_value(value) for value in values]
+        return self.client.get_client(write=True).sadd(self._make_key(name), *values)
 
     @omit_exception
-    def srem(self, name: str, *values):
-        return self.client.get_client(write=True).srem(
-            self._make_key(name), *[self._encode_value(value) for value in values]
-        )
+    def srem(self, name: str, *values, raw: bool = False):
+        if not raw:
+            values = [self._encode_value(value) for value in values]
+        return self.client.get_client(write=True).srem(self._make_key(name), *values)
 
     @omit_exception
     def smove(self, src: str, dst: str, value):
@@ -155,8 +349,10 @@ class ExtendedRedisCache(RedisCache):
         )
 
     @omit_exception
-    def smembers(self, name: str):
+    def smembers(self, name: str, raw: bool = False):
         raw_values = self.client.get_client(write=False).smembers(self._make_key(name))
+        if raw:
+            return raw_values
         return {self._decode_value(value) for value in raw_values}
 
     @omit_exception
@@ -344,6 +540,21 @@ class ExtendedRedisCache(RedisCache):
             thread_local=thread_local,
         )
 
+    def execute_script(self, script: str, keys: List[str], args: List = ()):
+        """
+        执行 Lua 脚本, keys 会自动 make_key, 脚本按内容缓存, 通过 EVALSHA 调用
+        参数和返回值不经过序列化
+        """
+        registered = self._scripts.get(script)
+        if registered is None:
+            registered = self.client.get_client(write=True).register_script(script)
+            self._scripts[script] = registered
+        return registered(
+            keys=[self._make_key(key) for key in keys],
+            args=list(args),
+            client=self.client.get_client(write=True),
+        )
+
     def script_load(self, script: str):
         client = self.client.get_client(write=True)
         return client.script_load(script)
@@ -0,0 +1,49 @@
+from common.subscriber import ChannelSubscriber
+from django.core.cache import cache
+
+
+class VersionTracker(ChannelSubscriber):
+    """
+    全局版本号, 以整数存储在 Redis 中, 数据变更时 INCR 并通过频道发布新的版本号
+    订阅就绪时直接返回进程内的版本号, 未就绪时每次从 Redis 读取
+    进程内按版本号缓存的数据在版本号变化后失效, 一次 INCR 即可让所有进程失效
+    """
+
+    def __init__(self, name: str, key: str, channel: str, retry_interval: float = 5.0):
+        """
+        :param name: 名称, 用于日志
+        :param key: 版本号的缓存键
+        :param channel: 版本号变更的频道, 消息内容为新的版本号
+        :param retry_interval: 订阅失败后重试的时间间隔, 单位为秒
+        """
+        self.key = key
+        super().__init__(name, channel, retry_interval)
+
+    def _reset(self):
+        super()._reset()
+        self._version = 0
+
+    def _load(self) -> int:
+        return int(cache.get(self.key) or 0)
+
+    def get(self) -> int:
+        self._ensure_started()
+        if not self._ready:
+            return self._load()
+        return self._version
+
+    def bump(self) -> int:
+        """
+        递增版本号并通知所有进程
+        :return: 新的版本号
+        """
+        version = cache.client.get_client(write=True).incr(cache.make_key(self.key))
+        cache.publish(self.channel, str(version))
+        self._version = max(self._version, version)
+        return version
+
+    def on_subscribe(self):
+        self._version = self._load()
+
+    def on_message(self, data: bytes):
+        self._version = max(self._version, int(data))
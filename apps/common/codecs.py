@@ -0,0 +1,78 @@
+from typing import Callable, Dict, List, Tuple
+
+import lz4.frame
+import msgpack
+
+
+class RecordCodec:
+    """
+    队列记录的紧凑编码
+    按 schema 的字段顺序将字典转为数组, 使用 msgpack 序列化, 不重复存储字段名
+    多条记录可打包为一个队列元素, 超过 compress_min_length 时整体 lz4 压缩
+
+    格式: 1 字节 MAGIC + 1 字节 schema 版本 + 1 字节标志位 + msgpack([[字段值, ...], ...])
+    """
+
+    MAGIC = 0xC1  # msgpack 中未使用的字节, 与 pickle(0x80) 和 lz4 帧(0x04) 的首字节区分
+    FLAG_COMPRESSED = 0x01
+
+    def __init__(
+        self,
+        schemas: Dict[int, Tuple[str, ...]],
+        legacy_decoder: Callable[[bytes], dict] = None,
+        compress_min_length: int = 512,
+    ):
+        """
+        :param schemas: {版本号: 字段元组}, 编码使用最大的版本号, 旧版本仅用于解码
+        :param legacy_decoder: 旧格式(单条 pickle + lz4)的解码函数
+        :param compress_min_length: 超过该字节数时尝试压缩
+        """
+        self.schemas = schemas
+        self.version = max(schemas)
+        self.fields = schemas[self.version]
+        self.legacy_decoder = legacy_decoder
+        self.compress_min_length = compress_min_length
+        self._header = bytes((self.MAGIC, self.version))
+
+    def encode(self, records: List[dict]) -> bytes:
+        """
+        将多条记录编码为一个队列元素
+        """
+        fields = self.fields
+        payload = msgpack.packb(
+            [[record.get(field) for field in fields] for record in records],
+            datetime=True,
+            use_bin_type=True,
+        )
+
+        flags = 0
+        if len(payload) > self.compress_min_length:
+            compressed = lz4.frame.compress(payload)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= self.FLAG_COMPRESSED
+
+        return self._header + bytes((flags,)) + payload
+
+    def decode(self, value: bytes) -> List[dict]:
+        """
+        将一个队列元素解码为记录列表, 值为 None 的字段会被省略
+        """
+        if value[0] != self.MAGIC:
+            if self.legacy_decoder is None:
+                raise ValueError("Unknown record format")
+            return [self.legacy_decoder(value)]
+
+        fields = self.schemas.get(value[1])
+        if fields is None:
+            raise ValueError(f"Unknown record schema version: {value[1]}")
+
+        payload = value[3:]
+        if value[2] & self.FLAG_COMPRESSED:
+            payload = lz4.frame.decompress(payload)
+
+        rows = msgpack.unpackb(payload, timestamp=3, raw=False)
+        return [
+            {field: item for field, item in zip(fields, row) if item is not None}
+            for row in rows
+        ]
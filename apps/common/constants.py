@@ -4,3 +4,28 @@ class Regex:
         r"^(13[0-9]|14[01456879]|15[0-35-9]|16[2567]|17[0-8]|18[0-9]|19[0-35-9])\d{8}$"
     )
     EMAIL = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z\u00A1-\uFFFF]{2,}$"
+
+
+class CeleryQueue:
+    """
+    异步任务队列, 按负载类型划分, 由独立的 worker 池消费, 互不影响
+    任务所属的队列在各应用的 tasks.py 中声明
+    """
+
+    DEFAULT = "default"
+    # 请求日志和任务结果写入 ClickHouse
+    INGESTION = "ingestion"
+    # 定时清理任务
+    MAINTENANCE = "maintenance"
+    # 用户活跃时间更新, 数量大且单个任务耗时短
+    USER_ACTIVITY = "user_activity"
+
+
+class CeleryPriority:
+    """
+    同一队列内的任务优先级, Redis broker 中 0 为最高优先级
+    """
+
+    HIGH = 0
+    NORMAL = 3
+    LOW = 6
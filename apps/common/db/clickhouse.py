@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Type
+
+from clickhouse_backend.idworker import id_worker
+from clickhouse_backend.models import ClickhouseModel, StringField
+from django.db import connections
+from django.db.models import Lookup
+from django.db.models.fields import AutoFieldMixin
+
+
+@StringField.register_lookup
+class Substring(Lookup):
+    """
+    子串匹配, 生成 `column LIKE '%x%'`
+    内置的 contains 会将列转换为 Nullable(String), 导致无法使用 ngrambf_v1/tokenbf_v1 索引
+    """
+
+    lookup_name = "substring"
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} LIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+@lru_cache(maxsize=None)
+def _get_columns(
+    model: Type[ClickhouseModel],
+) -> Tuple[Tuple[str, str, bool, Any], ...]:
+    """
+    获取模型的列信息: (字段名, 列名, 是否自增主键, 默认值)
+    自增主键与 ORM 写入时一致, 由 clickhouse_backend 的 id_worker 生成
+    使用同一个生成器和配置(CLICKHOUSE_WORKER_ID/CLICKHOUSE_DATACENTER_ID), 两种写入方式的 ID 不会冲突
+    """
+    return tuple(
+        (
+            field.attname,
+            field.column,
+            isinstance(field, AutoFieldMixin),
+            field.get_default(),
+        )
+        for field in model._meta.concrete_fields
+    )
+
+
+def bulk_insert_columnar(
+    model: Type[ClickhouseModel], rows: List[Dict], using: str = "clickhouse"
+) -> int:
+    """
+    将字典列表直接转换为列数组, 通过 ClickHouse 原生协议按列写入, 不创建模型实例
+    字典中不存在或值为 None 的字段使用模型字段的默认值, 多余的键会被忽略
+    :param model: ClickHouse 模型
+    :param rows: 数据列表
+    :param using: 数据库别名
+    :return: 写入的行数
+    """
+    if not rows:
+        return 0
+
+    columns = _get_columns(model)
+    data = []
+    for attname, _, is_auto, default in columns:
+        if is_auto:
+            data.append([row.get(attname) or id_worker.get_id() for row in rows])
+        else:
+            data.append(
+                [
+                    default if (value := row.get(attname)) is None else value
+                    for row in rows
+                ]
+            )
+
+    column_names = ", ".join(f"`{column}`" for _, column, _, _ in columns)
+    query = f"INSERT INTO `{model._meta.db_table}` ({column_names}) VALUES"
+
+    connection = connections[using]
+    connection.ensure_connection()
+    with connection.connection.pool.get_client() as client:
+        return client.execute(query, data, columnar=True)
@@ -32,11 +32,20 @@ class HeaderUtil:
         if not user_agent:
             user_agent = self.get_header("HTTP_USER_AGENT", "")
 
+        return self.parse_user_agent(user_agent)
+
+    @classmethod
+    def parse_user_agent(cls, user_agent: str):
+        """
+        解析 User-Agent, 结果缓存在本地磁盘
+        """
+        disk_cache = caches["disk"]
+
         user_agent_md5 = md5(user_agent.encode(), usedforsecurity=False).hexdigest()
 
-        key = self.USER_AGENT_KEY_TEMPLATE.format(user_agent_md5=user_agent_md5)
+        key = cls.USER_AGENT_KEY_TEMPLATE.format(user_agent_md5=user_agent_md5)
 
-        value = self.disk_cache.get(key)
+        value = disk_cache.get(key)
         if value is not None:
             return value
 
@@ -56,5 +65,5 @@ class HeaderUtil:
             "browser_family": parsed_ua.browser.family or "",
             "browser_version": parsed_ua.browser.version_string or "",
         }
-        self.disk_cache.set(key, value)
+        disk_cache.set(key, value)
         return value
@@ -0,0 +1,59 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+def hdr_buckets(lowest: float = 0.0005, highest: float = 60.0, sub_buckets: int = 4):
+    """
+    HDR 风格的对数线性分桶: 每个 2 的幂区间内再等分为 sub_buckets 个桶
+    相对误差不超过 1 / sub_buckets, 桶数量随量程对数增长
+    :param lowest: 最小边界, 单位为秒
+    :param highest: 最大边界, 单位为秒
+    :param sub_buckets: 每个 2 的幂区间内的桶数量
+    """
+    buckets = []
+    base = lowest
+    while base < highest:
+        for i in range(sub_buckets):
+            buckets.append(round(base * (1 + i / sub_buckets), 6))
+        base *= 2
+    buckets.append(highest)
+    return tuple(buckets)
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by resolved view",
+    ("view", "method", "status"),
+    buckets=hdr_buckets(),
+)
+
+
+def metrics_view(request):
+    """
+    Prometheus 指标, 设置 PROMETHEUS_MULTIPROC_DIR 时汇总所有 worker 进程的数据
+    需要在 Authorization 中携带 METRICS_BEARER_TOKEN, 未配置令牌时拒绝访问
+    """
+    token = settings.METRICS_BEARER_TOKEN
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if not token or not hmac.compare_digest(
+        authorization.encode(), f"Bearer {token}".encode()
+    ):
+        return HttpResponseForbidden()
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
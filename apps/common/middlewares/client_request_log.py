@@ -1,94 +1,113 @@
 from common.header import HeaderUtil
 from common.json import JsonUtil
-from common.services.ip import IPService
+from common.parsers import CachedJSONParser
 from common.services.jwt import SystemUserJWTAuthentication
+from django.conf import settings
+from django.http import QueryDict
 from django.utils import timezone
 from log.services import RequestLogService
 from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 
 
 class ClientRequestLogMiddleware:
-    SENSITIVE_FIELDS = {"password", "token", "secret", "refresh"}
+    SENSITIVE_FIELDS = frozenset({"password", "token", "secret", "refresh"})
+    BODY_METHODS = {"POST", "PUT", "PATCH"}
+    BODY_CONTENT_TYPES = {"application/json", "application/x-www-form-urlencoded"}
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
+        # 被排除的接口不做任何日志相关的处理
+        if RequestLogService.sampler.is_excluded(request.path):
+            return self.get_response(request)
+
         start_time = timezone.now()
 
         system_user_id = self._get_system_user_id(request)
 
-        # 过滤 POST 参数
-        post_params = self._get_post_params(request)
-        self._filter_post_params(post_params)
+        # 采集请求体, 敏感字段已脱敏
+        body_params = self._get_body_params(request)
 
         response = self.get_response(request)
 
-        header_util = HeaderUtil(request)
-
-        # 获取 IP 地址
-        ip_address = header_util.get_client_ip()
+        duration = int((timezone.now() - start_time).total_seconds() * 1000)
+        sample_rate = RequestLogService.sampler.sample(
+            request.path, response.status_code, duration
+        )
+        if sample_rate is None:
+            return response
 
-        # 获取地理位置信息
-        geo_info = IPService.get_ip_info(ip_address)
-
-        user_agent = header_util.get_user_agent()
+        header_util = HeaderUtil(request)
 
+        # 地理位置和 User-Agent 解析在日志写入 ClickHouse 前批量完成, 这里只记录原始值
         log_data = {
             "api_path": request.path,
             "query_params": JsonUtil.dumps(request.GET.dict()),
-            "body_params": JsonUtil.dumps(post_params),
+            "body_params": JsonUtil.dumps(body_params),
             "created_at": start_time,
-            "duration": int((timezone.now() - start_time).total_seconds() * 1000),
-            "client_ip": ip_address,
-            "country": geo_info["country"],
-            "region": geo_info["region"],
-            "city": geo_info["city"],
-            "time_zone": geo_info["time_zone"],
+            "duration": duration,
+            "client_ip": header_util.get_client_ip(),
             "status_code": response.status_code,
             "referer": header_util.get_header("HTTP_REFERER", ""),
             "origin": header_util.get_header("HTTP_ORIGIN", ""),
             "accept_language": header_util.get_header("HTTP_ACCEPT_LANGUAGE", ""),
             "host": header_util.get_header("HTTP_HOST", ""),
-            "user_agent": user_agent["user_agent"],
-            "device_family": user_agent["device_family"],
-            "device_brand": user_agent["device_brand"],
-            "device_model": user_agent["device_model"],
-            "device_type": user_agent["device_type"],
-            "os_family": user_agent["os_family"],
-            "os_version": user_agent["os_version"],
-            "browser_family": user_agent["browser_family"],
-            "browser_version": user_agent["browser_version"],
+            "user_agent": header_util.get_header("HTTP_USER_AGENT", ""),
             "user_id": system_user_id,
             "tenant_id": "",
             "request_id": header_util.get_header("HTTP_X_REQUEST_ID", ""),
+            "sample_rate": sample_rate,
         }
 
         RequestLogService.write_to_queue(log_data)
 
         return response
 
-    @staticmethod
-    def _get_post_params(request):
-        if request.method != "POST":
+    @classmethod
+    def _get_body_params(cls, request):
+        """
+        按 Content-Type 采集请求体, 只解析不超过大小上限的 JSON 和表单
+        文件上传, 二进制和超过上限的请求体不读取, 只记录类型和长度
+        JSON 解析结果缓存在请求上, 由 CachedJSONParser 复用
+        构建日志参数时替换顶层的敏感字段(不区分大小写), 不修改缓存的解析结果
+        """
+        if request.method not in cls.BODY_METHODS:
             return {}
 
-        content_type = request.META.get("CONTENT_TYPE", "").lower()
         try:
-            if "application/json" in content_type:
-                return JsonUtil.loads(request.body)
-            elif "application/x-www-form-urlencoded" in content_type:
-                return request.POST.dict()
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        if not content_length:
+            return {}
+
+        content_type = request.content_type
+        if (
+            content_type not in cls.BODY_CONTENT_TYPES
+            or content_length > settings.REQUEST_LOG_BODY_MAX_BYTES
+        ):
+            return {"_omitted": content_type, "_length": content_length}
+
+        try:
+            if content_type == "application/json":
+                data = JsonUtil.loads(request.body)
+                setattr(request, CachedJSONParser.PARSED_BODY_ATTR, data)
+                if not isinstance(data, dict):
+                    return data
+                items = data.items()
+            elif request.method == "POST":
+                items = request.POST.items()
+            else:
+                items = QueryDict(request.body, encoding=request.encoding).items()
         except Exception as e:
             print(e)
             return {}
 
-        return {}
-
-    def _filter_post_params(self, post_params):
-        for field in self.SENSITIVE_FIELDS:
-            if field in post_params:
-                post_params[field] = "******"
+        return {
+            key: "******" if key.lower() in cls.SENSITIVE_FIELDS else value
+            for key, value in items
+        }
 
     @staticmethod
     def _get_system_user_id(request):
@@ -0,0 +1,28 @@
+from time import perf_counter_ns
+
+from common.metrics import REQUEST_LATENCY
+
+
+class RequestMetricsMiddleware:
+    """记录每个视图的请求耗时分布, 使用 perf_counter_ns 计时"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # labels() 每次都要加锁查找, 缓存各标签组合的子指标
+        self._children = {}
+
+    def __call__(self, request):
+        start = perf_counter_ns()
+        response = self.get_response(request)
+        elapsed = (perf_counter_ns() - start) / 1e9
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else "<unresolved>"
+        key = (view, request.method, response.status_code // 100)
+        child = self._children.get(key)
+        if child is None:
+            child = REQUEST_LATENCY.labels(view, request.method, f"{key[2]}xx")
+            self._children[key] = child
+        child.observe(elapsed)
+
+        return response
@@ -1,9 +1,11 @@
-from authentication.constants import AuthConstants
-from authentication.tasks import update_user_last_active
+from authentication.services.last_active import LastActiveService
 
 
 class UpdateLastActiveMiddleware:
-    """中间件，用于更新会话的上次活跃时间"""
+    """
+    中间件，用于更新会话的上次活跃时间
+    每个设备在进程内去抖后直接写入时间戳, 不经过 celery
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -16,15 +18,6 @@ class UpdateLastActiveMiddleware:
 
         user = request.user
         if user.is_authenticated and "device_id" in request.auth:
-            device_id = request.auth.get("device_id")
-            device_session_key = (
-                AuthConstants.SYSTEM_USER_DEVICE_SESSION_TEMPLATE.format(
-                    user_id=user.id,
-                    device_id=device_id,
-                )
-            )
-            update_user_last_active.delay(
-                device_session_key=device_session_key, log_result=False
-            )
+            LastActiveService.touch(user.id, request.auth.get("device_id"))
 
         return response
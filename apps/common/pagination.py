@@ -1,5 +1,13 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
 from rest_framework.pagination import LimitOffsetPagination as LimitOffsetPagination_
 from rest_framework.pagination import PageNumberPagination as PageNumberPagination_
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitOffsetPagination(LimitOffsetPagination_):
@@ -14,3 +22,113 @@ class PageNumberPagination(PageNumberPagination_):
     page_size = 20  # 默认每页显示多少条
     page_size_query_param = "size"
     page_query_param = "page"
+
+
+class KeysetPagination(BasePagination):
+    """
+    基于 (created_at, id) 的游标分页, 按时间倒序, 只读取当前页的数据, 不执行 COUNT 和 OFFSET
+    用于 ClickHouse 的大表, 请求 count 时执行有上限的 COUNT
+    匹配的行数不超过 max_count 时 count 为准确值, 超过时 count 为 max_count 且 count_capped 为 true
+    """
+
+    max_page_size = 100  # 最大每页显示条数
+    page_size = 20  # 默认每页显示多少条
+    page_size_query_param = "size"
+    cursor_query_param = "cursor"
+    count_query_param = "with_count"  # 为 true 时返回总数
+    max_count = 10000  # 最多计数的行数
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count_capped = False
+        self.count = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+        if cursor is not None:
+            created_at, pk = cursor[0], cursor[1]
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk),
+                    created_at__gte=created_at,
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                    created_at__lte=created_at,
+                )
+
+        ordering = ("created_at", "id") if reverse else ("-created_at", "-id")
+        results = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset, request):
+        if request.query_params.get(self.count_query_param) not in ("1", "true"):
+            return None
+        # 只读取主键并限制行数, 多读取一行用于判断是否超过上限, 避免扫描全部匹配的数据
+        count = queryset.order_by().values("pk")[: self.max_count + 1].count()
+        self.count_capped = count > self.max_count
+        return min(count, self.max_count)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode()).decode()
+            created_at, pk, reverse = decoded.split("|")
+            return datetime.fromisoformat(created_at), int(pk), reverse == "1"
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def encode_cursor(self, instance, reverse: bool):
+        position = f"{instance.created_at.isoformat()}|{instance.pk}|{int(reverse)}"
+        encoded = base64.urlsafe_b64encode(position.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "count_capped": self.count_capped,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
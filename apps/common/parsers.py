@@ -0,0 +1,16 @@
+from rest_framework.parsers import JSONParser
+
+
+class CachedJSONParser(JSONParser):
+    """
+    优先使用请求日志中间件已解析的 JSON 请求体, 同一请求体只解析一次
+    """
+
+    PARSED_BODY_ATTR = "_parsed_json_body"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        django_request = getattr(request, "_request", request)
+        if hasattr(django_request, self.PARSED_BODY_ATTR):
+            return getattr(django_request, self.PARSED_BODY_ATTR)
+        return super().parse(stream, media_type, parser_context)
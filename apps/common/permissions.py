@@ -22,9 +22,7 @@ class HasPermission(BasePermission):
             # 超级管理员拥有所有权限
             return True
 
-        user_permissions = PermissionService.get_user_permissions(user)
-
-        if required_permission not in user_permissions:
+        if not PermissionService.has_permission(user, required_permission):
             raise PermissionDenied()
 
         return True
@@ -42,9 +40,7 @@ def require_permission(permission_code):
                 # 超级管理员拥有所有权限
                 return func(self, request, *args, **kwargs)
 
-            user_permissions = PermissionService.get_user_permissions(user)
-
-            if permission_code not in user_permissions:
+            if not PermissionService.has_permission(user, permission_code):
                 raise PermissionDenied()
 
             return func(self, request, *args, **kwargs)
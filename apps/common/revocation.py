@@ -0,0 +1,78 @@
+import hashlib
+import time
+from typing import Callable, Iterable, Set
+
+from common.subscriber import ChannelSubscriber
+
+
+class RevocationFilter(ChannelSubscriber):
+    """
+    进程内的已撤销 token 摘要集合, 用于在查询 Redis 黑名单前过滤掉绝大多数未撤销的 token
+    订阅撤销通知后全量加载, 之后按通知增量添加, 并定期全量同步以移除已过期的摘要
+    未完成加载或订阅中断时无法判断, might_contain 返回 True, 由调用方查询 Redis
+    """
+
+    def __init__(
+        self,
+        name: str,
+        channel: str,
+        load_func: Callable[[], Iterable[int]],
+        resync_interval: float = 300.0,
+        retry_interval: float = 5.0,
+    ):
+        """
+        :param name: 名称, 用于日志
+        :param channel: 撤销通知的频道, 消息内容为摘要
+        :param load_func: 全量加载的函数, 返回当前所有未过期的已撤销 token 的摘要
+        :param resync_interval: 全量同步的时间间隔, 单位为秒
+        :param retry_interval: 订阅或加载失败后重试的时间间隔, 单位为秒
+        """
+        self.load_func = load_func
+        self.resync_interval = resync_interval
+        super().__init__(name, channel, retry_interval)
+
+    def _reset(self):
+        super()._reset()
+        self._digests: Set[int] = set()
+        self._synced_at = 0.0
+
+    @staticmethod
+    def digest(token: str) -> int:
+        """
+        token 的 64 位摘要, 撤销通知和进程内集合中只保存摘要
+        使用有符号整数, 可以直接作为 Redis intset 的成员
+        """
+        return int.from_bytes(
+            hashlib.blake2b(token.encode(), digest_size=8).digest(), "big", signed=True
+        )
+
+    def might_contain(self, token: str) -> bool:
+        """
+        token 是否可能已被撤销, 返回 False 时一定未被撤销, 返回 True 时需要查询 Redis 确认
+        """
+        self._ensure_started()
+        if not self._ready:
+            return True
+        return self.digest(token) in self._digests
+
+    def add(self, digest: int):
+        self._digests.add(digest)
+
+    def on_subscribe(self):
+        self._resync()
+
+    def on_message(self, data: bytes):
+        self.add(int(data))
+
+    def on_idle(self):
+        if time.monotonic() - self._synced_at >= self.resync_interval:
+            self._resync()
+
+    def _resync(self):
+        digests = set(self.load_func())
+        self._digests = digests
+        self._synced_at = time.monotonic()
+        self._logger.debug(f"Resynced {len(digests)} revoked tokens")
+
+    def stats(self) -> dict:
+        return {"ready": self._ready, "size": len(self._digests)}
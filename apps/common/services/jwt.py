@@ -1,6 +1,7 @@
 from accounts.services.system_user import SystemUserService
 from authentication.constants import AuthConstants
-from django.core.cache import cache
+from authentication.services.blacklist import TokenBlacklistService
+from common.revocation import RevocationFilter
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import PermissionDenied
@@ -9,8 +10,49 @@ from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidTok
 from rest_framework_simplejwt.settings import api_settings
 
 
+def _load_revoked_access_tokens():
+    # 未过期的 access token 只可能在当前到最长有效期之后的桶中
+    now = timezone.now()
+    return TokenBlacklistService.get_digests(
+        TokenBlacklistService.ACCESS,
+        now.timestamp(),
+        (now + api_settings.ACCESS_TOKEN_LIFETIME).timestamp(),
+    )
+
+
+# 进程内的 access token 黑名单过滤器, 未命中时不再查询 Redis
+access_token_filter = RevocationFilter(
+    "access_token",
+    channel=AuthConstants.ACCESS_TOKEN_REVOKED_CHANNEL,
+    load_func=_load_revoked_access_tokens,
+    resync_interval=AuthConstants.BLACKLIST_RESYNC_INTERVAL,
+)
+
+
 class SystemUserJWTAuthentication(JWTAuthentication):
+    # 认证结果缓存在 Django 请求对象上, 中间件和 DRF 视图共用, 同一请求只认证一次
+    REQUEST_CACHE_ATTR = "_system_user_jwt_auth"
+
     def authenticate(self, request):
+        """
+        认证请求, 成功返回 (user, auth), 失败抛出异常, 结果(包括异常)在同一请求内复用
+        :param request: Django HttpRequest 或 DRF Request
+        """
+        django_request = getattr(request, "_request", request)
+        result = getattr(django_request, self.REQUEST_CACHE_ATTR, None)
+        if result is None:
+            try:
+                result = (self._authenticate(request), None)
+            except (InvalidToken, AuthenticationFailed, PermissionDenied) as e:
+                result = (None, e)
+            setattr(django_request, self.REQUEST_CACHE_ATTR, result)
+
+        auth, exc = result
+        if exc is not None:
+            raise exc
+        return auth
+
+    def _authenticate(self, request):
         header = self.get_header(request)
         if header is None:
             raise InvalidToken(_("header is valid"))
@@ -21,11 +63,12 @@ class SystemUserJWTAuthentication(JWTAuthentication):
 
         validated_token = self.get_validated_token(raw_token)
 
-        value = cache.zscore(
-            AuthConstants.ACCESS_TOKEN_BLACKLIST,
-            validated_token.token.decode(),  # noqa
-        )
-        if value and value > timezone.now().timestamp():
+        token = validated_token.token.decode()  # noqa
+        if access_token_filter.might_contain(token) and (
+            TokenBlacklistService.contains(
+                TokenBlacklistService.ACCESS, token, validated_token["exp"]
+            )
+        ):
             raise AuthenticationFailed(_("token in blacklist"))
 
         user = self.get_user(validated_token)
@@ -48,18 +91,19 @@ class SystemUserJWTAuthentication(JWTAuthentication):
 
     @staticmethod
     def add_access_to_blacklist(access_token, access_token_exp):
-        cache.zadd(
-            AuthConstants.ACCESS_TOKEN_BLACKLIST,
-            {
-                str(access_token): access_token_exp,
-            },
+        """
+        写入黑名单后通知所有进程的过滤器, 当前进程直接添加, 不等待通知
+        """
+        digest = TokenBlacklistService.add(
+            TokenBlacklistService.ACCESS,
+            str(access_token),
+            access_token_exp,
+            channel=AuthConstants.ACCESS_TOKEN_REVOKED_CHANNEL,
         )
+        access_token_filter.add(digest)
 
     @staticmethod
     def add_refresh_to_blacklist(refresh, refresh_exp):
-        cache.zadd(
-            AuthConstants.REFRESH_TOKEN_BLACKLIST,
-            {
-                str(refresh): refresh_exp,
-            },
+        TokenBlacklistService.add(
+            TokenBlacklistService.REFRESH, str(refresh), refresh_exp
         )
@@ -0,0 +1,266 @@
+import os
+import struct
+import threading
+import time
+from typing import Callable, List
+
+from loguru import logger
+
+
+class DiskSpillQueue:
+    """
+    Redis 不可用时的本地磁盘兜底
+    推送失败或熔断期间, 已编码的队列元素追加写入本地分段文件, 后台线程在 Redis 恢复后重新推送
+    每个进程写自己的分段文件, 重放时通过 rename 认领, 多进程之间无需加锁
+
+    分段文件格式: 重复的 4 字节长度(大端) + 数据, 末尾不完整的记录会被忽略
+    文件状态: {name}-{pid}-{seq}.open(写入中) -> .seg(已关闭, 待重放) -> .{pid}.replay(重放中)
+    """
+
+    HEADER = struct.Struct(">I")
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        push_func: Callable[[List[bytes]], object],
+        max_bytes: int = 512 * 2**20,
+        segment_bytes: int = 4 * 2**20,
+        replay_interval: float = 5.0,
+        circuit_cooldown: float = 10.0,
+    ):
+        """
+        :param name: 队列名称, 用于文件名和日志
+        :param directory: 分段文件目录
+        :param push_func: 推送到 Redis 的函数, 接收已编码的队列元素列表, 失败时抛出异常
+        :param max_bytes: 磁盘占用上限, 超过后丢弃新的数据
+        :param segment_bytes: 单个分段文件的大小上限
+        :param replay_interval: 重放检查的时间间隔, 单位为秒
+        :param circuit_cooldown: 推送失败后熔断的时间, 熔断期间直接写入磁盘, 单位为秒
+        """
+        self.name = name
+        self.directory = directory
+        self.push_func = push_func
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.replay_interval = replay_interval
+        self.circuit_cooldown = circuit_cooldown
+
+        self._logger = logger.bind(component=f"Spill:{name}")
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_path = None
+        self._file_size = 0
+        self._seq = 0
+        self._open_until = 0.0
+        self._disk_bytes = None
+        self._thread = None
+        self._wakeup = threading.Event()
+
+        self.spilled_count = 0
+        self.replayed_count = 0
+        self.dropped_count = 0
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # fork 后的子进程, 父进程打开的文件和线程不可用
+            self._reset()
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(
+                target=self._run, name=f"spill-replayer-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def push(self, entries: List[bytes]):
+        """
+        推送到 Redis, 失败或熔断期间写入磁盘
+        """
+        self._ensure_started()
+
+        if not self.circuit_open:
+            try:
+                self.push_func(entries)
+                return
+            except Exception as e:
+                self._open_until = time.monotonic() + self.circuit_cooldown
+                self._logger.error(f"Push failed, circuit open: {e}")
+
+        self.spill(entries)
+
+    def spill(self, entries: List[bytes]):
+        """
+        追加写入当前进程的分段文件, 超过磁盘占用上限时丢弃
+        """
+        size = sum(self.HEADER.size + len(entry) for entry in entries)
+        with self._lock:
+            if self._get_disk_bytes() + size > self.max_bytes:
+                self.dropped_count += len(entries)
+                self._logger.warning(
+                    f"Disk limit {self.max_bytes} reached, drop {len(entries)} entries"
+                )
+                return
+
+            try:
+                if self._file is None:
+                    self._open_segment()
+                self._file.write(
+                    b"".join(self.HEADER.pack(len(entry)) + entry for entry in entries)
+                )
+                self._file.flush()
+            except OSError as e:
+                self.dropped_count += len(entries)
+                self._logger.error(f"Spill {len(entries)} entries failed: {e}")
+                return
+
+            self._file_size += size
+            self._disk_bytes += size
+            self.spilled_count += len(entries)
+
+            if self._file_size >= self.segment_bytes:
+                self._close_segment()
+
+    def _open_segment(self):
+        self._seq += 1
+        self._file_path = os.path.join(
+            self.directory, f"{self.name}-{self._pid}-{self._seq}.open"
+        )
+        self._file = open(self._file_path, "ab")
+        self._file_size = 0
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.rename(self._file_path, self._file_path[: -len(".open")] + ".seg")
+        self._file = None
+        self._file_path = None
+        self._file_size = 0
+
+    def _get_disk_bytes(self) -> int:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(
+                entry.stat().st_size
+                for entry in os.scandir(self.directory)
+                if entry.name.startswith(f"{self.name}-")
+            )
+        return self._disk_bytes
+
+    def _run(self):
+        while not self._wakeup.wait(timeout=self.replay_interval):
+            try:
+                self.replay()
+            except Exception as e:
+                self._logger.error(f"Replay failed: {e}")
+
+    def replay(self):
+        """
+        重放磁盘中的数据, 熔断期间跳过
+        """
+        if self.circuit_open:
+            return
+
+        with self._lock:
+            self._close_segment()
+            # 磁盘占用以实际文件为准, 包含其他进程写入的数据
+            self._disk_bytes = None
+
+        for path in self._claim_segments():
+            entries = self._read_segment(path)
+            try:
+                if entries:
+                    self.push_func(entries)
+            except Exception as e:
+                self._open_until = time.monotonic() + self.circuit_cooldown
+                self._logger.error(f"Replay {path} failed, circuit open: {e}")
+                os.rename(path, self._segment_path(path))
+                return
+
+            os.remove(path)
+            with self._lock:
+                self.replayed_count += len(entries)
+            self._logger.info(f"Replayed {len(entries)} entries from {path}")
+
+    def _claim_segments(self):
+        """
+        认领待重放的分段文件, 包括已退出进程遗留的写入中和重放中的文件
+        """
+        prefix = f"{self.name}-"
+        for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+            if not entry.name.startswith(prefix):
+                continue
+
+            # {pid}-{seq}.open / {pid}-{seq}.seg / {pid}-{seq}.seg.{pid}.replay
+            parts = entry.name[len(prefix) :].split(".")
+            if parts[-1] == "open":
+                owner = int(parts[0].split("-")[0])
+            elif parts[-1] == "replay":
+                owner = int(parts[-2])
+            elif parts[-1] == "seg":
+                owner = None
+            else:
+                continue
+            if owner is not None and self._is_alive(owner):
+                continue
+
+            path = f"{self._segment_path(entry.path)}.{self._pid}.replay"
+            try:
+                os.rename(entry.path, path)
+            except FileNotFoundError:
+                # 已被其他进程认领
+                continue
+            yield path
+
+    @staticmethod
+    def _segment_path(path: str) -> str:
+        directory, filename = os.path.split(path)
+        return os.path.join(directory, filename.split(".", 1)[0] + ".seg")
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _read_segment(self, path: str) -> List[bytes]:
+        with open(path, "rb") as f:
+            data = f.read()
+
+        entries = []
+        offset = 0
+        while offset + self.HEADER.size <= len(data):
+            (length,) = self.HEADER.unpack_from(data, offset)
+            offset += self.HEADER.size
+            if offset + length > len(data):
+                break
+            entries.append(data[offset : offset + length])
+            offset += length
+        return entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "spilled": self.spilled_count,
+                "replayed": self.replayed_count,
+                "dropped": self.dropped_count,
+                "disk_bytes": self._disk_bytes or 0,
+                "circuit_open": self.circuit_open,
+            }
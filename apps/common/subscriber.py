@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from typing import Dict, List
+
+from django.core.cache import cache
+from loguru import logger
+
+
+class ChannelSubscriber:
+    """
+    订阅 Redis 频道的进程内组件, 首次使用时注册到进程内共享的 dispatcher, 所有组件共用一个订阅连接和线程
+    订阅成功后调用 on_subscribe, 之后每收到一条消息调用 on_message, 每次等待消息后调用 on_idle
+    订阅中断或回调失败时调用 on_disconnect, retry_interval 秒后重新订阅, 期间 ready 为 False
+    """
+
+    def __init__(self, name: str, channel: str, retry_interval: float = 5.0):
+        """
+        :param name: 名称, 用于日志
+        :param channel: 订阅的频道, 会加上缓存前缀
+        :param retry_interval: 订阅失败后重试的时间间隔, 单位为秒
+        """
+        self.name = name
+        self.channel = channel
+        self.retry_interval = retry_interval
+
+        self._logger = logger.bind(component=f"{type(self).__name__}:{name}")
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._registered = False
+        self._ready = False
+        # 回调失败后, 在该时间之后重新订阅
+        self._retry_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """
+        是否已订阅并完成 on_subscribe, 为 False 时可能错过了消息
+        """
+        return self._ready
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            # fork 后的子进程, 父进程的线程和订阅连接不可用
+            self._reset()
+        dispatcher.register(self)
+
+    def on_subscribe(self):
+        pass
+
+    def on_message(self, data: bytes):
+        pass
+
+    def on_idle(self):
+        pass
+
+    def on_disconnect(self):
+        pass
+
+
+class ChannelDispatcher:
+    """
+    进程内共享的订阅连接, 在一个后台线程中订阅所有已注册组件的频道, 按频道分发消息
+    首次注册时启动线程, fork 后在子进程中重新启动
+    连接中断时所有组件进入未就绪状态, retry_interval 秒后重新连接并重新订阅
+    单个组件的回调失败只影响该组件, 在该组件的 retry_interval 秒后重新调用 on_subscribe
+    """
+
+    def __init__(self, retry_interval: float = 5.0):
+        """
+        :param retry_interval: 连接中断后重新连接的时间间隔, 单位为秒
+        """
+        self.retry_interval = retry_interval
+        self._logger = logger.bind(component="ChannelDispatcher")
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._subscribers: List[ChannelSubscriber] = []
+        # 当前连接上已订阅的频道(带缓存前缀)及已就绪的组件, 只在后台线程中访问
+        self._active: Dict[bytes, List[ChannelSubscriber]] = {}
+
+    def register(self, subscriber: ChannelSubscriber):
+        if self._pid != os.getpid():
+            self._reset()
+
+        if (
+            subscriber._registered
+            and self._thread is not None
+            and self._thread.is_alive()
+        ):
+            return
+
+        with self._lock:
+            if not subscriber._registered:
+                self._subscribers.append(subscriber)
+                subscriber._registered = True
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="channel-dispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            pubsub = cache.pubsub()
+            self._active = {}
+            try:
+                while True:
+                    self._subscribe_pending(pubsub)
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        for subscriber in list(
+                            self._active.get(message["channel"], ())
+                        ):
+                            self._call(
+                                subscriber, subscriber.on_message, message["data"]
+                            )
+                    for subscribers in list(self._active.values()):
+                        for subscriber in list(subscribers):
+                            self._call(subscriber, subscriber.on_idle)
+            except Exception as e:
+                self._logger.error(f"Subscription failed: {e}")
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for subscriber in subscribers:
+                    self._detach(subscriber, retry_at=0.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:  # nosec
+                    pass
+            time.sleep(self.retry_interval)
+
+    def _subscribe_pending(self, pubsub):
+        """
+        订阅新注册或等待重试的组件的频道, 先订阅再调用 on_subscribe, 期间发布的消息在之后处理, 不会遗漏
+        """
+        now = time.monotonic()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber._ready or subscriber._retry_at > now:
+                continue
+            channel = cache.make_key(subscriber.channel).encode()
+            if channel not in self._active:
+                pubsub.subscribe(channel)
+                self._active[channel] = []
+            if self._call(subscriber, subscriber.on_subscribe):
+                self._active[channel].append(subscriber)
+                subscriber._ready = True
+
+    def _call(self, subscriber: ChannelSubscriber, func, *args) -> bool:
+        """
+        调用组件的回调, 失败时该组件进入未就绪状态, 稍后重新调用 on_subscribe
+        :return: 是否调用成功
+        """
+        try:
+            func(*args)
+        except Exception as e:
+            subscriber._logger.error(f"Subscription failed: {e}")
+            self._detach(
+                subscriber, retry_at=time.monotonic() + subscriber.retry_interval
+            )
+            return False
+        return True
+
+    def _detach(self, subscriber: ChannelSubscriber, retry_at: float):
+        subscriber._ready = False
+        subscriber._retry_at = retry_at
+        # 频道保持订阅, 未就绪的组件不再接收消息, 重新就绪时由 on_subscribe 全量加载
+        for subscribers in self._active.values():
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+        try:
+            subscriber.on_disconnect()
+        except Exception as e:
+            subscriber._logger.error(f"Disconnect handler failed: {e}")
+
+
+dispatcher = ChannelDispatcher()
@@ -1,10 +1,20 @@
+from common.pagination import KeysetPagination
 from common.permissions import HasPermission
 from common.services.jwt import SystemUserJWTAuthentication
 from common.views import BaseReadOnlyModelViewSet
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from .filters import RequestLogFilter
-from .serializers import RequestLogOutputSerializer
-from .services import RequestLogService
+from .serializers import (
+    RequestLogOutputSerializer,
+    RequestMetricApiPathInputSerializer,
+    RequestMetricApiPathOutputSerializer,
+    RequestMetricTimeSeriesInputSerializer,
+    RequestMetricTimeSeriesOutputSerializer,
+)
+from .services import RequestLogService, RequestMetricService
 
 
 class RequestLogViewSet(BaseReadOnlyModelViewSet):
@@ -12,6 +22,7 @@ class RequestLogViewSet(BaseReadOnlyModelViewSet):
     permission_classes = (HasPermission,)
     service = RequestLogService
     queryset = service.all()
+    pagination_class = KeysetPagination
     serializer_class = RequestLogOutputSerializer
     filterset_class = RequestLogFilter
 
@@ -19,3 +30,37 @@ class RequestLogViewSet(BaseReadOnlyModelViewSet):
         "list": "log:request_log:list",
         "retrieve": "log:request_log:retrieve",
     }
+
+
+class RequestMetricViewSet(viewsets.ViewSet):
+    authentication_classes = (SystemUserJWTAuthentication,)
+    permission_classes = (HasPermission,)
+
+    action_permissions = {
+        "time_series": "log:request_metric:list",
+        "api_paths": "log:request_metric:list",
+    }
+
+    @action(methods=["GET"], detail=False, url_path="time-series")
+    def time_series(self, request):
+        serializer = RequestMetricTimeSeriesInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            RequestMetricTimeSeriesOutputSerializer(
+                RequestMetricService.time_series(**serializer.validated_data),
+                many=True,
+            ).data
+        )
+
+    @action(methods=["GET"], detail=False, url_path="api-paths")
+    def api_paths(self, request):
+        serializer = RequestMetricApiPathInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            RequestMetricApiPathOutputSerializer(
+                RequestMetricService.api_paths(**serializer.validated_data),
+                many=True,
+            ).data
+        )
@@ -1,3 +1,76 @@
 class LogConstant:
     LOG_BATCH_LIST_KEY = "log_batch_list"
+    # 每个消费者独立的 processing 队列, 数据写入 ClickHouse 成功后才删除
+    LOG_PROCESSING_LIST_TEMPLATE = "log_batch_list:processing:{consumer}"
+    LOG_CONSUMER_LOCK_TEMPLATE = "log_batch_list:lock:{consumer}"
+    # 每个消费者当前批次写入失败的次数, Hash: {consumer: 次数}, 确认后删除
+    LOG_BATCH_ATTEMPTS_KEY = "log_batch_list:attempts"
+    # 失败次数达到上限的批次移动到死信队列, 不再阻塞后续的数据, 可通过 requeue_dead_request_logs 重新处理
+    LOG_DEAD_LETTER_LIST_KEY = "log_batch_list:dead"
+    LOG_BATCH_MAX_ATTEMPTS = 10
+    CONSUMER_LOCK_TIMEOUT = 60 * 10
+    # 常驻消费者续期锁的间隔(秒), 需要远小于锁的过期时间
+    CONSUMER_LOCK_HEARTBEAT = 30
     BATCH_PROCESS_SIZE = 1000
+    PUSH_CHUNK_SIZE = 500
+    # 常驻消费者: 累计 N 条或 T 毫秒后写入
+    CONSUMER_BATCH_SIZE = 5000
+    CONSUMER_FLUSH_INTERVAL_MS = 1000
+    # 阻塞等待的最长时间(秒), 需要小于 Redis 的 SOCKET_TIMEOUT
+    CONSUMER_BLOCK_TIMEOUT = 1
+    CONSUMER_RETRY_DELAY = 5
+    # 日志查询的时间范围(秒), 未指定开始时间时默认查询最近一天, 限制最大范围以减少扫描的分区
+    QUERY_DEFAULT_WINDOW = 60 * 60 * 24
+    QUERY_MAX_WINDOW = 60 * 60 * 24 * 31
+    # 请求指标预聚合表
+    METRIC_MINUTELY_TABLE = "log_requestlog_minutely"
+    METRIC_HOURLY_TABLE = "log_requestlog_hourly"
+    # 时间序列的聚合粒度(秒), 不小于 1 小时的粒度使用小时表
+    METRIC_INTERVALS = {
+        "1m": 60,
+        "5m": 60 * 5,
+        "15m": 60 * 15,
+        "1h": 60 * 60,
+        "1d": 60 * 60 * 24,
+    }
+    METRIC_MAX_POINTS = 1440
+    METRIC_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+    METRIC_API_PATH_ORDERINGS = ("requests", "error_rate", "p95", "p99")
+    # 队列记录的字段顺序, 新增或调整字段时增加版本号, 旧版本保留用于解码
+    RECORD_SCHEMAS = {
+        1: (
+            "api_path",
+            "query_params",
+            "body_params",
+            "created_at",
+            "duration",
+            "client_ip",
+            "status_code",
+            "referer",
+            "origin",
+            "accept_language",
+            "host",
+            "user_agent",
+            "user_id",
+            "tenant_id",
+            "request_id",
+        ),
+        2: (
+            "api_path",
+            "query_params",
+            "body_params",
+            "created_at",
+            "duration",
+            "client_ip",
+            "status_code",
+            "referer",
+            "origin",
+            "accept_language",
+            "host",
+            "user_agent",
+            "user_id",
+            "tenant_id",
+            "request_id",
+            "sample_rate",
+        ),
+    }
@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import Optional
+
+from django.db import close_old_connections, connections
+from loguru import logger
+from redis.exceptions import LockError, LockNotOwnedError, RedisError
+
+from .constants import LogConstant
+from .services import RequestLogService
+
+
+class RequestLogConsumer:
+    """
+    常驻的请求日志消费者
+    阻塞等待队列中的日志, 累计 batch_size 条或 flush_interval_ms 毫秒后写入 ClickHouse
+    """
+
+    def __init__(
+        self,
+        consumer: str,
+        stop_event: threading.Event,
+        batch_size: int = LogConstant.CONSUMER_BATCH_SIZE,
+        flush_interval_ms: int = LogConstant.CONSUMER_FLUSH_INTERVAL_MS,
+        block_timeout: float = LogConstant.CONSUMER_BLOCK_TIMEOUT,
+    ):
+        """
+        :param consumer: 消费者标识, 同时决定 processing 队列, 重启后需保持一致
+        :param stop_event: 停止信号
+        :param batch_size: 每批最多写入的数量
+        :param flush_interval_ms: 每批最长的累计时间, 单位为毫秒
+        :param block_timeout: 阻塞等待的最长时间, 单位为秒
+        """
+        self.consumer = consumer
+        self.stop_event = stop_event
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.block_timeout = block_timeout
+        self._logger = logger.bind(component=f"RequestLogConsumer:{consumer}")
+
+    def run(self):
+        lock = RequestLogService.consumer_lock(self.consumer)
+        if not lock.acquire(blocking=False):
+            self._logger.error("Consumer is already running, exit.")
+            return
+
+        self._logger.info("Consumer started.")
+        try:
+            owned = self._consume(lock)
+        finally:
+            connections.close_all()
+        if owned:
+            try:
+                lock.release()
+            except LockError:
+                # 锁已过期或被其他进程获取
+                pass
+        self._logger.info("Consumer stopped.")
+
+    def _heartbeat(self, lock, renewed_at: float) -> Optional[float]:
+        """
+        距离上次续期超过 CONSUMER_LOCK_HEARTBEAT 秒时重置锁的过期时间
+        Redis 暂时不可用时下次重试
+        :return: 上次续期的时间, 锁已不属于当前消费者时返回 None
+        """
+        now = time.monotonic()
+        if now - renewed_at < LogConstant.CONSUMER_LOCK_HEARTBEAT:
+            return renewed_at
+        try:
+            lock.reacquire()
+        except LockNotOwnedError:
+            # 锁已过期并可能被其他进程获取, 不再处理 processing 队列, 由持有锁的进程处理
+            self._logger.error("Consumer lock lost, exit.")
+            return None
+        except RedisError as e:
+            self._logger.error(f"Renew consumer lock failed: {e}")
+            return renewed_at
+        return now
+
+    def _consume(self, lock) -> bool:
+        """
+        :return: 退出时是否仍持有锁
+        """
+        logs = []
+        # 先处理上次未确认的数据, 取出之前不能追加新的数据, 否则确认时会一并删除
+        resumed = False
+        deadline = time.monotonic() + self.flush_interval
+        renewed_at = time.monotonic()
+
+        while not self.stop_event.is_set():
+            renewed_at = self._heartbeat(lock, renewed_at)
+            if renewed_at is None:
+                return False
+
+            if len(logs) >= self.batch_size or (logs and time.monotonic() >= deadline):
+                if not self._flush(logs):
+                    # 写入失败, 数据保留在内存和 processing 队列中, 稍后重试
+                    self.stop_event.wait(LogConstant.CONSUMER_RETRY_DELAY)
+                    continue
+                logs = []
+
+            more = self._call(
+                RequestLogService.drain_queue,
+                self.consumer,
+                self.batch_size - len(logs),
+                resume=not resumed,
+            )
+            if more is None:
+                continue
+            resumed = True
+            if more:
+                deadline = self._extend(logs, more, deadline)
+                continue
+
+            # 队列为空, 阻塞等待, 但不超过当前批次的截止时间
+            timeout = self.block_timeout
+            if logs:
+                timeout = min(timeout, max(deadline - time.monotonic(), 0.01))
+            values = self._call(RequestLogService.wait_queue, self.consumer, timeout)
+            deadline = self._extend(logs, values or [], deadline)
+
+        if logs:
+            # 优雅退出, 写入失败的数据在下次启动时重新处理
+            self._flush(logs)
+        return True
+
+    def _call(self, func, *args, **kwargs):
+        """
+        执行队列操作, Redis 暂时不可用时记录日志, 等待 CONSUMER_RETRY_DELAY 秒后由调用方重试
+        :return: 操作的返回值, 失败时返回 None
+        """
+        try:
+            return func(*args, **kwargs)
+        except RedisError as e:
+            self._logger.error(f"{func.__name__} failed: {e}")
+            self.stop_event.wait(LogConstant.CONSUMER_RETRY_DELAY)
+            return None
+
+    def _extend(self, logs: list, values: list, deadline: float) -> float:
+        """
+        追加到当前批次, 新批次从第一条日志开始计算截止时间
+        :return: 当前批次的截止时间
+        """
+        if values and not logs:
+            deadline = time.monotonic() + self.flush_interval
+        logs.extend(values)
+        return deadline
+
+    def _flush(self, logs) -> bool:
+        try:
+            RequestLogService.enrich_batch(logs)
+            RequestLogService.create_batch(logs)
+        except Exception as e:
+            self._logger.error(f"Insert {len(logs)} request logs failed: {e}")
+            close_old_connections()
+            if self._call(RequestLogService.fail_queue, self.consumer):
+                # 多次写入失败, 已移动到死信队列, 继续处理后续的数据
+                self._logger.error(f"Moved {len(logs)} request logs to dead letter.")
+                return True
+            return False
+
+        # 确认失败时数据已写入, processing 队列在下一批确认时一并删除
+        self._call(RequestLogService.ack_queue, self.consumer)
+        return True
@@ -1,3 +1,9 @@
+from datetime import timedelta
+
+from common.db.clickhouse import Substring
+from common.exceptions import ApplicationException
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import (
     CharFilter,
     DateTimeFilter,
@@ -5,11 +11,13 @@ from django_filters.rest_framework import (
     NumberFilter,
 )
 
+from .constants import LogConstant
 from .models import RequestLog
 
 
 class RequestLogFilter(FilterSet):
-    api_path = CharFilter(lookup_expr="icontains")
+    # LIKE 区分大小写, 可以使用 ngram 索引, ILIKE 无法使用索引
+    api_path = CharFilter(lookup_expr=Substring.lookup_name)
     client_ip = CharFilter()
     status_code = CharFilter()
     user_id = CharFilter()
@@ -34,3 +42,30 @@ class RequestLogFilter(FilterSet):
             "created_at_lte",
             "created_at_gte",
         )
+
+    def is_list(self) -> bool:
+        view = (getattr(self.request, "parser_context", None) or {}).get("view")
+        return getattr(view, "action", None) == "list"
+
+    def filter_queryset(self, queryset):
+        """
+        限制查询的时间范围, 只扫描范围内的月分区
+        列表未指定开始时间时默认查询结束时间(默认为当前时间)前一天的数据
+        详情(get_object 同样会调用)按主键查询, 不添加默认的时间范围
+        """
+        queryset = super().filter_queryset(queryset)
+
+        start_time = self.form.cleaned_data.get("created_at_gte")
+        end_time = self.form.cleaned_data.get("created_at_lte") or timezone.now()
+        if start_time is None:
+            if not self.is_list():
+                return queryset
+            start_time = end_time - timedelta(seconds=LogConstant.QUERY_DEFAULT_WINDOW)
+            queryset = queryset.filter(created_at__gte=start_time)
+
+        if end_time - start_time > timedelta(seconds=LogConstant.QUERY_MAX_WINDOW):
+            raise ApplicationException(
+                _("查询的时间范围不能超过 %(days)s 天")
+                % {"days": LogConstant.QUERY_MAX_WINDOW // 86400}
+            )
+        return queryset
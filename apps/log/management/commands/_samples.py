@@ -0,0 +1,51 @@
+import uuid
+
+from django.utils import timezone
+
+
+def generate_sample_logs(rows: int, enriched: bool = True):
+    """
+    生成用于基准测试的请求日志
+    :param rows: 行数
+    :param enriched: 是否包含地理位置和设备信息(写入 ClickHouse 前补充的字段)
+    """
+    now = timezone.now()
+    logs = []
+    for i in range(rows):
+        log = {
+            "api_path": f"/api/v1/accounts/system-users/{i % 100}/",
+            "query_params": '{"page": "1", "size": "20"}',
+            "body_params": "{}",
+            "created_at": now,
+            "duration": i % 500,
+            "client_ip": f"10.0.{i % 256}.{i % 199}",
+            "status_code": 200,
+            "referer": "https://example.com/",
+            "origin": "https://example.com",
+            "accept_language": "zh-CN,zh;q=0.9",
+            "host": "api.example.com",
+            "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
+            "user_id": str(i % 1000),
+            "tenant_id": "",
+            "request_id": uuid.uuid4().hex,
+            "sample_rate": 1.0,
+        }
+        if enriched:
+            log.update(
+                {
+                    "country": "China",
+                    "region": "Shanghai",
+                    "city": "Shanghai",
+                    "time_zone": "+08:00",
+                    "device_family": "Mac",
+                    "device_brand": "Apple",
+                    "device_model": "Mac",
+                    "device_type": "PC",
+                    "os_family": "Mac OS X",
+                    "os_version": "10.15.7",
+                    "browser_family": "Chrome",
+                    "browser_version": "131.0.0",
+                }
+            )
+        logs.append(log)
+    return logs
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from log.constants import LogConstant
+
+ROLLUPS = (
+    (LogConstant.METRIC_MINUTELY_TABLE, "toStartOfMinute"),
+    (LogConstant.METRIC_HOURLY_TABLE, "toStartOfHour"),
+)
+
+# 与 0003_request_metric_rollups 中物化视图的查询一致, 按月分区逐个写入
+BACKFILL_SQL = """
+INSERT INTO {table} (
+    bucket, tenant_id, api_path, row_count, request_count,
+    status_2xx_count, status_3xx_count, status_4xx_count, status_5xx_count,
+    duration_sum, duration_max, duration_quantiles
+)
+SELECT
+    {bucket}(created_at) AS bucket,
+    tenant_id,
+    api_path,
+    count() AS row_count,
+    sum(1 / sample_rate) AS request_count,
+    sumIf(1 / sample_rate, status_code >= 200 AND status_code < 300) AS status_2xx_count,
+    sumIf(1 / sample_rate, status_code >= 300 AND status_code < 400) AS status_3xx_count,
+    sumIf(1 / sample_rate, status_code >= 400 AND status_code < 500) AS status_4xx_count,
+    sumIf(1 / sample_rate, status_code >= 500) AS status_5xx_count,
+    sum(duration / sample_rate) AS duration_sum,
+    max(duration) AS duration_max,
+    quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(duration) AS duration_quantiles
+FROM log_requestlog
+WHERE toYYYYMM(created_at) = %(partition)s AND created_at < {before}
+GROUP BY bucket, tenant_id, api_path
+"""
+
+# 物化视图的创建时间, 之前写入的日志没有进入预聚合表
+VIEW_CREATED_AT_SQL = (
+    "(SELECT metadata_modification_time FROM system.tables "
+    "WHERE database = currentDatabase() AND name = %(view)s)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "将物化视图创建前已有的请求日志写入分钟/小时预聚合表, 部署 0003_request_metric_rollups 后执行一次, "
+        "默认回填创建时间(created_at)早于物化视图创建时间的日志, 重复执行会重复计数"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            help="回填创建时间早于该时间的日志, 默认为物化视图的创建时间",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="预聚合表中已有该时间之前的数据时仍然回填",
+        )
+
+    def handle(self, *args, **options):
+        before = (
+            "parseDateTimeBestEffort(%(before)s)"
+            if options["before"]
+            else VIEW_CREATED_AT_SQL
+        )
+        with connections["clickhouse"].cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT partition FROM system.parts "
+                "WHERE active AND database = currentDatabase() AND table = 'log_requestlog' "
+                "ORDER BY partition"
+            )
+            partitions = [int(row[0]) for row in cursor.fetchall()]
+
+            for table, bucket in ROLLUPS:
+                params = {"view": f"{table}_mv", "before": options["before"]}
+                # 该时间所在的桶之前的数据只能来自回填(或延迟写入的日志)
+                cursor.execute(
+                    f"SELECT count() FROM {table} WHERE bucket < {bucket}({before})",
+                    params,
+                )
+                (existing,) = cursor.fetchone()
+                if existing and not options["force"]:
+                    raise CommandError(
+                        f"{table} already has {existing} rows before the backfill boundary, "
+                        "use --force to backfill anyway"
+                    )
+
+                for partition in partitions:
+                    cursor.execute(
+                        BACKFILL_SQL.format(table=table, bucket=bucket, before=before),
+                        {**params, "partition": partition},
+                    )
+                    self.stdout.write(f"{table}: backfilled partition {partition}")
@@ -0,0 +1,66 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from log.services import RequestLogService
+
+from ._samples import generate_sample_logs
+
+
+class Command(BaseCommand):
+    help = "对比请求日志队列元素 pickle + lz4 与紧凑编码的单条字节数及编解码耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="日志条数")
+        parser.add_argument(
+            "--records-per-entry",
+            type=int,
+            nargs="+",
+            default=[1, 20, 100],
+            help="紧凑编码每个队列元素打包的日志条数",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="每种方式的执行次数")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        logs = generate_sample_logs(rows, enriched=False)
+
+        client = cache.client
+        self._report(
+            "pickle+lz4",
+            rows,
+            options["repeat"],
+            lambda: [client.encode(log) for log in logs],
+            lambda entries: [client.decode(entry) for entry in entries],
+        )
+
+        codec = RequestLogService.codec
+        for size in options["records_per_entry"]:
+            chunks = [logs[i : i + size] for i in range(0, rows, size)]
+            self._report(
+                f"codec x{size}",
+                rows,
+                options["repeat"],
+                lambda chunks=chunks: [codec.encode(chunk) for chunk in chunks],
+                lambda entries: [codec.decode(entry) for entry in entries],
+            )
+
+    def _report(self, name, rows, repeat, encode, decode):
+        encode_cost, entries = self._timeit(encode, repeat)
+        decode_cost, _ = self._timeit(lambda: decode(entries), repeat)
+        total = sum(len(entry) for entry in entries)
+        self.stdout.write(
+            f"{name:<12} bytes/record={total / rows:<8.1f} "
+            f"encode={encode_cost / rows * 1e6:.2f}us/record "
+            f"decode={decode_cost / rows * 1e6:.2f}us/record"
+        )
+
+    @staticmethod
+    def _timeit(func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            cost = time.perf_counter() - start
+            best = cost if best is None else min(best, cost)
+        return best, result
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from log.apis import RequestLogViewSet
+from log.models import RequestLog
+from log.services import RequestLogService
+from rest_framework.request import Request
+
+
+class Command(BaseCommand):
+    help = (
+        "对比常用日志查询在原过滤方式(ILIKE, 不限时间范围)与列表接口当前的过滤方式"
+        "(LIKE, 默认查询最近一天)下读取的行数和耗时, 需连接实际的 ClickHouse 执行"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--api-path", help="子串查询的接口地址, 默认取最新一条日志")
+        parser.add_argument("--user-id")
+        parser.add_argument("--request-id")
+        parser.add_argument("--client-ip")
+        parser.add_argument("--size", type=int, default=20, help="每页条数")
+
+    def handle(self, *args, **options):
+        latest = RequestLogService.all().first()
+        if latest is None:
+            raise CommandError("No request log found")
+
+        queries = {
+            "api_path": options["api_path"] or latest.api_path[1:-1],
+            "user_id": options["user_id"] or latest.user_id,
+            "request_id": options["request_id"] or latest.request_id,
+            "client_ip": options["client_ip"] or latest.client_ip,
+        }
+        legacy_lookups = {"api_path": "api_path__icontains"}
+
+        for name, value in queries.items():
+            legacy = RequestLogService.all().filter(
+                **{legacy_lookups.get(name, name): value}
+            )
+            current = self._list_queryset({name: value})
+            for label, queryset in (("legacy", legacy), ("current", current)):
+                rows, bytes_, elapsed = self._execute(
+                    queryset[: options["size"]], options["size"]
+                )
+                self.stdout.write(
+                    f"{name:<11} {label:<8} rows_read={rows:<12,} "
+                    f"bytes_read={bytes_:<14,} elapsed={elapsed * 1000:.1f}ms"
+                )
+
+    @staticmethod
+    def _list_queryset(params):
+        """
+        与列表接口相同的查询: 通过视图的过滤器(包括默认的时间范围)过滤, 按分页的顺序排序
+        """
+        view = RequestLogViewSet(action="list", args=(), kwargs={}, format_kwarg=None)
+        view.request = Request(
+            RequestFactory().get("/", params), parser_context={"view": view}
+        )
+        return view.filter_queryset(view.get_queryset()).order_by("-created_at", "-id")
+
+    @staticmethod
+    def _execute(queryset, size):
+        sql, params = queryset.query.sql_with_params()
+        connection = connections[RequestLog.objects.db]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            cursor.fetchmany(size)
+            last_query = cursor.cursor._client.last_query
+        return (
+            last_query.progress.rows,
+            last_query.progress.bytes,
+            last_query.elapsed,
+        )
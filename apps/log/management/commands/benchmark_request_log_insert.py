@@ -0,0 +1,54 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from log.models import RequestLog
+from log.services import RequestLogService
+
+from ._samples import generate_sample_logs
+
+
+class Command(BaseCommand):
+    help = (
+        "对比请求日志 ORM 写入与按列原生写入的吞吐量(rows/sec), 写入临时表, 结束后删除"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[10000, 100000], help="每轮行数"
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="每种方式的执行次数")
+
+    def handle(self, *args, **options):
+        table = RequestLog._meta.db_table
+        scratch_table = f"{table}_benchmark_{uuid.uuid4().hex[:8]}"
+
+        with connections["clickhouse"].cursor() as cursor:
+            cursor.execute(f"CREATE TABLE `{scratch_table}` AS `{table}`")
+
+        RequestLog._meta.db_table = scratch_table
+        try:
+            for rows in options["rows"]:
+                logs = generate_sample_logs(rows)
+                for name, func in (
+                    ("orm", RequestLogService.create_batch_orm),
+                    ("columnar", RequestLogService.create_batch),
+                ):
+                    best = min(
+                        self._timeit(func, logs) for _ in range(options["repeat"])
+                    )
+                    self.stdout.write(
+                        f"{name:<10} rows={rows:<8} best={best:.3f}s "
+                        f"rows/sec={rows / best:,.0f}"
+                    )
+        finally:
+            RequestLog._meta.db_table = table
+            with connections["clickhouse"].cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS `{scratch_table}`")
+
+    @staticmethod
+    def _timeit(func, logs):
+        start = time.perf_counter()
+        func(logs)
+        return time.perf_counter() - start
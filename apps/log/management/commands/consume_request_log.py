@@ -0,0 +1,64 @@
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from log.constants import LogConstant
+from log.consumers import RequestLogConsumer
+
+
+class Command(BaseCommand):
+    help = "常驻消费请求日志队列, 累计 N 条或 T 毫秒后写入 ClickHouse"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name",
+            default=socket.gethostname(),
+            help="消费者名称, 重启后需保持一致以便处理未确认的数据",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="并发写入的消费者数量"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=LogConstant.CONSUMER_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--flush-interval-ms",
+            type=int,
+            default=LogConstant.CONSUMER_FLUSH_INTERVAL_MS,
+        )
+        parser.add_argument(
+            "--block-timeout",
+            type=float,
+            default=LogConstant.CONSUMER_BLOCK_TIMEOUT,
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write(f"Received signal {signum}, stopping...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        threads = []
+        for index in range(options["workers"]):
+            consumer = RequestLogConsumer(
+                consumer=f"{options['name']}:{index}",
+                stop_event=stop_event,
+                batch_size=options["batch_size"],
+                flush_interval_ms=options["flush_interval_ms"],
+                block_timeout=options["block_timeout"],
+            )
+            thread = threading.Thread(
+                target=consumer.run, name=f"request-log-consumer-{index}"
+            )
+            thread.start()
+            threads.append(thread)
+
+        # 主线程需要保持可响应信号
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
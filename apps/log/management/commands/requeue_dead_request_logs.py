@@ -0,0 +1,13 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from log.constants import LogConstant
+
+
+class Command(BaseCommand):
+    help = "将死信队列中的请求日志放回主队列重新写入, 用于排查并修复写入失败的原因之后"
+
+    def handle(self, *args, **options):
+        moved = cache.move_all(
+            LogConstant.LOG_DEAD_LETTER_LIST_KEY, LogConstant.LOG_BATCH_LIST_KEY
+        )
+        self.stdout.write(f"requeued {moved} entries")
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-17 21:06
+
+import clickhouse_backend.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="requestlog",
+            name="sample_rate",
+            field=clickhouse_backend.models.Float32Field(
+                default=1, verbose_name="采样率, 统计数量时按 1 / 采样率还原"
+            ),
+        ),
+    ]
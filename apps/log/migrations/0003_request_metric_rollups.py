@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# 按分钟/小时预聚合的请求指标, 由物化视图在写入 log_requestlog 时同步写入
+# 计数按 1 / sample_rate 还原采样前的数量, 耗时分位数为采样后数据的近似值
+# 物化视图只处理创建之后写入的日志, 已有的日志需执行一次 backfill_request_metric_rollups 命令回填
+ROLLUP_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table}
+(
+    `bucket` DateTime,
+    `tenant_id` String,
+    `api_path` String,
+    `row_count` SimpleAggregateFunction(sum, UInt64),
+    `request_count` SimpleAggregateFunction(sum, Float64),
+    `status_2xx_count` SimpleAggregateFunction(sum, Float64),
+    `status_3xx_count` SimpleAggregateFunction(sum, Float64),
+    `status_4xx_count` SimpleAggregateFunction(sum, Float64),
+    `status_5xx_count` SimpleAggregateFunction(sum, Float64),
+    `duration_sum` SimpleAggregateFunction(sum, Float64),
+    `duration_max` SimpleAggregateFunction(max, Float64),
+    `duration_quantiles` AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), Float64)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYYYYMM(bucket)
+ORDER BY (tenant_id, api_path, bucket)
+"""
+
+ROLLUP_VIEW_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS {table}_mv TO {table} AS
+SELECT
+    {bucket}(created_at) AS bucket,
+    tenant_id,
+    api_path,
+    count() AS row_count,
+    sum(1 / sample_rate) AS request_count,
+    sumIf(1 / sample_rate, status_code >= 200 AND status_code < 300) AS status_2xx_count,
+    sumIf(1 / sample_rate, status_code >= 300 AND status_code < 400) AS status_3xx_count,
+    sumIf(1 / sample_rate, status_code >= 400 AND status_code < 500) AS status_4xx_count,
+    sumIf(1 / sample_rate, status_code >= 500) AS status_5xx_count,
+    sum(duration / sample_rate) AS duration_sum,
+    max(duration) AS duration_max,
+    quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(duration) AS duration_quantiles
+FROM log_requestlog
+GROUP BY bucket, tenant_id, api_path
+"""
+
+ROLLUPS = (
+    ("log_requestlog_minutely", "toStartOfMinute"),
+    ("log_requestlog_hourly", "toStartOfHour"),
+)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log", "0002_requestlog_sample_rate"),
+    ]
+
+    operations = [
+        operation
+        for table, bucket in ROLLUPS
+        for operation in (
+            migrations.RunSQL(
+                ROLLUP_TABLE_SQL.format(table=table),
+                reverse_sql=f"DROP TABLE IF EXISTS {table}",
+                hints={"clickhouse": True},
+            ),
+            migrations.RunSQL(
+                ROLLUP_VIEW_SQL.format(table=table, bucket=bucket),
+                reverse_sql=f"DROP VIEW IF EXISTS {table}_mv",
+                hints={"clickhouse": True},
+            ),
+        )
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-17 21:12
+
+import clickhouse_backend.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log", "0003_request_metric_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="requestlog",
+            index=clickhouse_backend.models.Index(
+                fields=["api_path"],
+                granularity=4,
+                name="idx_api_path_ngram",
+                type=clickhouse_backend.models.NgrambfV1(3, 8192, 3, 0),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestlog",
+            index=clickhouse_backend.models.Index(
+                fields=["client_ip"],
+                granularity=64,
+                name="idx_client_ip",
+                type=clickhouse_backend.models.BloomFilter(0.001),
+            ),
+        ),
+        # 新增的索引只对之后写入的数据生效, 为已有数据构建索引
+        migrations.RunSQL(
+            "ALTER TABLE log_requestlog MATERIALIZE INDEX idx_api_path_ngram",
+            reverse_sql=migrations.RunSQL.noop,
+            hints={"clickhouse": True},
+        ),
+        migrations.RunSQL(
+            "ALTER TABLE log_requestlog MATERIALIZE INDEX idx_client_ip",
+            reverse_sql=migrations.RunSQL.noop,
+            hints={"clickhouse": True},
+        ),
+    ]
@@ -39,6 +39,9 @@ class RequestLog(ClickhouseModel):
         default="", verbose_name="请求方式, GET/POST/PUT/DELETE"
     )
     tenant_id = clickhouse_models.StringField(default="", verbose_name="租户 ID")
+    sample_rate = clickhouse_models.Float32Field(
+        default=1, verbose_name="采样率, 统计数量时按 1 / 采样率还原"
+    )
 
     class Meta:
         verbose_name = "请求日志"
@@ -53,6 +56,13 @@ class RequestLog(ClickhouseModel):
                 type=clickhouse_models.BloomFilter(0.001),
                 granularity=64,
             ),
+            # 子串查询(LIKE '%x%')使用 ngram 布隆过滤器
+            clickhouse_models.Index(
+                fields=["api_path"],
+                name="idx_api_path_ngram",
+                type=clickhouse_models.NgrambfV1(3, 8192, 3, 0),
+                granularity=4,
+            ),
             clickhouse_models.Index(
                 fields=["user_id"],
                 name="idx_user_id",
@@ -65,4 +75,10 @@ class RequestLog(ClickhouseModel):
                 type=clickhouse_models.BloomFilter(0.001),
                 granularity=64,
             ),
+            clickhouse_models.Index(
+                fields=["client_ip"],
+                name="idx_client_ip",
+                type=clickhouse_models.BloomFilter(0.001),
+                granularity=64,
+            ),
         ]
@@ -0,0 +1,62 @@
+import random
+import re
+from typing import Iterable, Optional, Tuple
+
+
+class RequestLogSampler:
+    """
+    按接口路径的请求日志采样策略
+    规则在初始化时合并为一个正则, 每个请求只需一次匹配, 按规则顺序取第一个匹配项
+    采样率为 0 表示不记录, 为 1 表示全部记录
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[Tuple[str, float]] = (),
+        default_rate: float = 1.0,
+        slow_threshold_ms: int = 1000,
+    ):
+        """
+        :param rules: [(路径正则, 采样率), ...], 正则从路径开头匹配
+        :param default_rate: 未匹配任何规则时的采样率
+        :param slow_threshold_ms: 耗时超过该值(毫秒)的请求始终记录
+        """
+        self.rates = []
+        patterns = []
+        for index, (pattern, rate) in enumerate(rules):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"Invalid sample rate {rate} for {pattern}")
+            patterns.append(f"(?P<r{index}>{pattern})")
+            self.rates.append(float(rate))
+        self.matcher = re.compile("|".join(patterns)) if patterns else None
+        self.default_rate = float(default_rate)
+        self.slow_threshold_ms = slow_threshold_ms
+
+    def get_rate(self, path: str) -> float:
+        """
+        获取路径对应的采样率
+        """
+        if self.matcher is not None:
+            match = self.matcher.match(path)
+            if match is not None:
+                return self.rates[int(match.lastgroup[1:])]
+        return self.default_rate
+
+    def is_excluded(self, path: str) -> bool:
+        """
+        路径是否被排除, 被排除的请求不记录日志, 5xx 与慢请求也不例外
+        """
+        return self.get_rate(path) == 0
+
+    def sample(self, path: str, status_code: int, duration: int) -> Optional[float]:
+        """
+        决定是否记录该请求
+        5xx 或耗时超过阈值的请求始终记录, 采样率记为 1
+        :return: 记录时返回采样率(用于统计时按 1 / 采样率还原数量), 不记录时返回 None
+        """
+        rate = self.get_rate(path)
+        if rate == 0:
+            return None
+        if rate >= 1 or status_code >= 500 or duration >= self.slow_threshold_ms:
+            return 1.0
+        return rate if random.random() < rate else None
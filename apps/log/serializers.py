@@ -1,5 +1,8 @@
+from common.exceptions import ApplicationException
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from .constants import LogConstant
 from .models import RequestLog
 
 
@@ -7,3 +10,60 @@ class RequestLogOutputSerializer(serializers.ModelSerializer):
     class Meta:
         model = RequestLog
         fields = "__all__"
+
+
+class RequestMetricQueryInputSerializer(serializers.Serializer):
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    tenant_id = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if attrs["start_time"] >= attrs["end_time"]:
+            raise ApplicationException(_("开始时间需早于结束时间"))
+        return attrs
+
+
+class RequestMetricTimeSeriesInputSerializer(RequestMetricQueryInputSerializer):
+    interval = serializers.ChoiceField(
+        choices=tuple(LogConstant.METRIC_INTERVALS), default="1m"
+    )
+    api_path = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        attrs["interval"] = LogConstant.METRIC_INTERVALS[attrs["interval"]]
+        seconds = (attrs["end_time"] - attrs["start_time"]).total_seconds()
+        if seconds / attrs["interval"] > LogConstant.METRIC_MAX_POINTS:
+            raise ApplicationException(_("时间范围过大, 请选择更大的时间粒度"))
+        return attrs
+
+
+class RequestMetricApiPathInputSerializer(RequestMetricQueryInputSerializer):
+    order_by = serializers.ChoiceField(
+        choices=LogConstant.METRIC_API_PATH_ORDERINGS, default="requests"
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class RequestMetricOutputSerializer(serializers.Serializer):
+    rows = serializers.IntegerField()
+    requests = serializers.IntegerField()
+    status_2xx = serializers.IntegerField()
+    status_3xx = serializers.IntegerField()
+    status_4xx = serializers.IntegerField()
+    status_5xx = serializers.IntegerField()
+    error_rate = serializers.FloatField()
+    avg_duration = serializers.FloatField()
+    max_duration = serializers.FloatField()
+    p50 = serializers.FloatField()
+    p90 = serializers.FloatField()
+    p95 = serializers.FloatField()
+    p99 = serializers.FloatField()
+
+
+class RequestMetricTimeSeriesOutputSerializer(RequestMetricOutputSerializer):
+    time = serializers.DateTimeField()
+
+
+class RequestMetricApiPathOutputSerializer(RequestMetricOutputSerializer):
+    api_path = serializers.CharField()
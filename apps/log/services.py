@@ -1,26 +1,398 @@
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, List, Optional
 
+from common.buffer import BufferedQueueWriter
+from common.codecs import RecordCodec
+from common.db.clickhouse import bulk_insert_columnar
+from common.header import HeaderUtil
+from common.services.ip import IPService
+from common.spill import DiskSpillQueue
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
 
 from .constants import LogConstant
 from .models import RequestLog
+from .sampling import RequestLogSampler
+
+
+def _push_to_queue(logs: List[Dict]):
+    size = settings.REQUEST_LOG_BUFFER["RECORDS_PER_ENTRY"]
+    entries = [
+        RequestLogService.codec.encode(logs[i : i + size])
+        for i in range(0, len(logs), size)
+    ]
+    RequestLogService.spill.push(entries)
+
+
+def _lpush_entries(entries: List[bytes]):
+    cache.lpush_many(
+        LogConstant.LOG_BATCH_LIST_KEY,
+        entries,
+        chunk_size=LogConstant.PUSH_CHUNK_SIZE,
+        raw=True,
+    )
+
+
+def _create_buffer():
+    options = settings.REQUEST_LOG_BUFFER
+    return BufferedQueueWriter(
+        name="request_log",
+        flush_func=_push_to_queue,
+        max_size=options["MAX_SIZE"],
+        flush_size=options["FLUSH_SIZE"],
+        flush_interval=options["FLUSH_INTERVAL"],
+        overflow_policy=options["OVERFLOW_POLICY"],
+        block_timeout=options["BLOCK_TIMEOUT"],
+    )
+
+
+def _create_spill():
+    options = settings.QUEUE_SPILL
+    return DiskSpillQueue(
+        name="request_log",
+        directory=options["DIRECTORY"],
+        push_func=_lpush_entries,
+        max_bytes=options["MAX_BYTES"],
+        segment_bytes=options["SEGMENT_BYTES"],
+        replay_interval=options["REPLAY_INTERVAL"],
+        circuit_cooldown=options["CIRCUIT_COOLDOWN"],
+    )
+
+
+def _create_sampler():
+    options = settings.REQUEST_LOG_SAMPLING
+    return RequestLogSampler(
+        rules=options["RULES"],
+        default_rate=options["DEFAULT_RATE"],
+        slow_threshold_ms=options["SLOW_THRESHOLD_MS"],
+    )
 
 
 class RequestLogService:
+    buffer = SimpleLazyObject(_create_buffer)
+    spill = SimpleLazyObject(_create_spill)
+    sampler = SimpleLazyObject(_create_sampler)
+    codec = RecordCodec(
+        LogConstant.RECORD_SCHEMAS,
+        legacy_decoder=lambda value: cache.client.decode(value),
+    )
+
+    @staticmethod
+    def enrich_batch(logs: List[Dict]) -> List[Dict]:
+        """
+        补充地理位置和设备信息, 同一批次中相同的 IP 和 User-Agent 只解析一次
+        已补充过的日志(包含 country 字段)会被跳过
+        队列解码时会省略值为 None 的字段, 没有 IP 或 User-Agent 的日志跳过对应的补充, 使用字段默认值
+        :param logs: 日志数据列表
+        """
+        pending = [log for log in logs if "country" not in log]
+        if not pending:
+            return logs
+
+        ip_infos = {
+            ip_address: IPService.get_ip_info(ip_address)
+            for ip_address in {log.get("client_ip") for log in pending}
+            if ip_address is not None
+        }
+        user_agents = {
+            user_agent: HeaderUtil.parse_user_agent(user_agent)
+            for user_agent in {log.get("user_agent") for log in pending}
+            if user_agent is not None
+        }
+
+        for log in pending:
+            user_agent = log.get("user_agent")
+            if user_agent is not None:
+                log.update(user_agents[user_agent])
+
+            geo_info = ip_infos.get(log.get("client_ip"))
+            if geo_info is None:
+                continue
+            log["country"] = geo_info["country"]
+            log["region"] = geo_info["region"]
+            log["city"] = geo_info["city"]
+            log["time_zone"] = geo_info["time_zone"]
+
+        return logs
+
     @staticmethod
     def create_batch(logs: List[Dict]):
         """
-        批量写入日志
+        批量写入日志, 按列通过原生协议写入, 不创建模型实例
+        :param logs: 日志数据列表
+        """
+        return bulk_insert_columnar(RequestLog, logs)
+
+    @staticmethod
+    def create_batch_orm(logs: List[Dict]):
+        """
+        通过 ORM 批量写入日志
         :param logs: 日志数据列表
         """
         log_objects = [RequestLog(**log) for log in logs]
         return RequestLog.objects.bulk_create(log_objects)
 
+    @classmethod
+    def write_to_queue(cls, log_data):
+        """写入进程内缓冲区, 由后台线程批量推送到队列"""
+        cls.buffer.put(log_data)
+
+    @staticmethod
+    def drain_queue(
+        consumer: str,
+        count: int = LogConstant.BATCH_PROCESS_SIZE,
+        resume: bool = True,
+    ) -> List[Dict]:
+        """
+        从队列中取出一批日志, 移动到消费者的 processing 队列
+        :param consumer: 消费者标识
+        :param count: 取出的日志数量, 队列为空时返回已取出的部分
+        :param resume: 上一批未确认时是否返回上一批的数据
+        """
+        return cache.drain_records(
+            LogConstant.LOG_BATCH_LIST_KEY,
+            LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer=consumer),
+            count,
+            RequestLogService.codec.decode,
+            settings.REQUEST_LOG_BUFFER["RECORDS_PER_ENTRY"],
+            resume=resume,
+        )
+
+    @classmethod
+    def wait_queue(cls, consumer: str, timeout: float) -> List[Dict]:
+        """
+        阻塞等待队列中的一个元素, 移动到消费者的 processing 队列
+        超时返回空列表
+        """
+        entry = cache.brpoplpush(
+            LogConstant.LOG_BATCH_LIST_KEY,
+            LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer=consumer),
+            timeout,
+            raw=True,
+        )
+        if entry is None:
+            return []
+        return cls.codec.decode(entry)
+
+    @staticmethod
+    def ack_queue(consumer: str):
+        """确认消费者 processing 队列中的日志已写入"""
+        cache.ack(LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer=consumer))
+        cache.hdel(LogConstant.LOG_BATCH_ATTEMPTS_KEY, consumer)
+
     @staticmethod
-    def write_to_queue(log_data):
-        """写入队列"""
-        cache.lpush(LogConstant.LOG_BATCH_LIST_KEY, log_data)
+    def fail_queue(consumer: str) -> bool:
+        """
+        记录消费者 processing 队列中的日志写入失败, 达到 LOG_BATCH_MAX_ATTEMPTS 次后移动到死信队列
+        :return: 是否已移动到死信队列
+        """
+        attempts = cache.client.get_client(write=True).hincrby(
+            cache.make_key(LogConstant.LOG_BATCH_ATTEMPTS_KEY), consumer, 1
+        )
+        if attempts < LogConstant.LOG_BATCH_MAX_ATTEMPTS:
+            return False
+
+        cache.move_all(
+            LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer=consumer),
+            LogConstant.LOG_DEAD_LETTER_LIST_KEY,
+        )
+        cache.hdel(LogConstant.LOG_BATCH_ATTEMPTS_KEY, consumer)
+        return True
+
+    @classmethod
+    def recover_queues(cls) -> int:
+        """
+        将没有进程处理的 processing 队列(如消费者所在的节点已下线)放回主队列
+        能获取到消费者的锁说明当前没有进程在处理该队列
+        :return: 放回的队列元素数量
+        """
+        pattern = cache.make_key(
+            LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer="*")
+        )
+        prefix = pattern[:-1]
+        recovered = 0
+        for key in cache.client.get_client(write=True).scan_iter(
+            match=pattern, count=100
+        ):
+            consumer = key.decode()[len(prefix) :]
+            lock = cls.consumer_lock(consumer)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                recovered += cache.move_all(
+                    LogConstant.LOG_PROCESSING_LIST_TEMPLATE.format(consumer=consumer),
+                    LogConstant.LOG_BATCH_LIST_KEY,
+                )
+                cache.hdel(LogConstant.LOG_BATCH_ATTEMPTS_KEY, consumer)
+            finally:
+                lock.release()
+        return recovered
+
+    @staticmethod
+    def consumer_lock(consumer: str):
+        """同一消费者同一时间只允许一个进程处理 processing 队列"""
+        return cache.lock(
+            LogConstant.LOG_CONSUMER_LOCK_TEMPLATE.format(consumer=consumer),
+            timeout=LogConstant.CONSUMER_LOCK_TIMEOUT,
+            blocking=False,
+        )
+
+    @classmethod
+    def flush_queue(cls):
+        """立即将缓冲区中的日志推送到队列, 用于 worker 退出时"""
+        cls.buffer.close()
+
+    @classmethod
+    def buffer_stats(cls) -> dict:
+        """缓冲区计数: 已缓冲, 已推送, 已丢弃, 以及 Redis 不可用时的磁盘兜底计数"""
+        return {**cls.buffer.stats(), "spill": cls.spill.stats()}
 
     @staticmethod
     def all():
         return RequestLog.objects.all().order_by("-created_at")
+
+
+class RequestMetricService:
+    """
+    基于预聚合表查询请求指标, 不扫描原始日志表
+    """
+
+    @staticmethod
+    def _get_table(interval: int, start_time: datetime, end_time: datetime) -> str:
+        """
+        粒度为整小时且时间范围的起止均为整点时使用小时表
+        否则小时表的桶会超出查询范围, 使用分钟表
+        """
+        aligned = all(t.timestamp() % 3600 == 0 for t in (start_time, end_time))
+        if interval % 3600 == 0 and aligned:
+            return LogConstant.METRIC_HOURLY_TABLE
+        return LogConstant.METRIC_MINUTELY_TABLE
+
+    @staticmethod
+    def _get_interval_expr(interval: int) -> str:
+        if interval % 86400 == 0:
+            return f"INTERVAL {interval // 86400} DAY"
+        if interval % 3600 == 0:
+            return f"INTERVAL {interval // 3600} HOUR"
+        return f"INTERVAL {interval // 60} MINUTE"
+
+    @staticmethod
+    def _get_metric_columns() -> str:
+        quantiles = ", ".join(str(q) for q in LogConstant.METRIC_QUANTILES)
+        return f"""
+            sum(row_count) AS rows,
+            sum(request_count) AS requests,
+            sum(status_2xx_count) AS status_2xx,
+            sum(status_3xx_count) AS status_3xx,
+            sum(status_4xx_count) AS status_4xx,
+            sum(status_5xx_count) AS status_5xx,
+            if(requests > 0, status_5xx / requests, 0) AS error_rate,
+            if(requests > 0, sum(duration_sum) / requests, 0) AS avg_duration,
+            max(duration_max) AS max_duration,
+            quantilesTDigestMerge({quantiles})(duration_quantiles) AS quantile_values,
+            quantile_values[1] AS p50,
+            quantile_values[2] AS p90,
+            quantile_values[3] AS p95,
+            quantile_values[4] AS p99
+        """
+
+    @staticmethod
+    def _get_conditions(
+        start_time: datetime,
+        end_time: datetime,
+        api_path: Optional[str],
+        tenant_id: Optional[str],
+    ):
+        conditions = ["bucket >= %(start_time)s", "bucket < %(end_time)s"]
+        params = {"start_time": start_time, "end_time": end_time}
+        if api_path:
+            conditions.append("api_path = %(api_path)s")
+            params["api_path"] = api_path
+        if tenant_id is not None:
+            conditions.append("tenant_id = %(tenant_id)s")
+            params["tenant_id"] = tenant_id
+        return " AND ".join(conditions), params
+
+    @staticmethod
+    def _fetch(sql: str, params: Dict) -> List[Dict]:
+        with connections["clickhouse"].cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            row.pop("quantile_values")
+            for key in (
+                "requests",
+                "status_2xx",
+                "status_3xx",
+                "status_4xx",
+                "status_5xx",
+            ):
+                row[key] = round(row[key])
+            for key in ("avg_duration", "p50", "p90", "p95", "p99"):
+                row[key] = round(row[key], 2)
+            row["error_rate"] = round(row["error_rate"], 4)
+        return rows
+
+    @classmethod
+    def time_series(
+        cls,
+        start_time: datetime,
+        end_time: datetime,
+        interval: int,
+        api_path: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        按时间粒度聚合的请求量, 状态码分布和耗时分位数
+        :param start_time: 开始时间(包含)
+        :param end_time: 结束时间(不包含)
+        :param interval: 聚合粒度, 单位为秒, 需为分钟的整数倍
+        :param api_path: 接口地址, 为空时统计所有接口
+        :param tenant_id: 租户 ID, 为 None 时统计所有租户
+        """
+        where, params = cls._get_conditions(start_time, end_time, api_path, tenant_id)
+        sql = f"""
+        SELECT
+            toStartOfInterval(bucket, {cls._get_interval_expr(interval)}) AS time,
+            {cls._get_metric_columns()}
+        FROM {cls._get_table(interval, start_time, end_time)}
+        WHERE {where}
+        GROUP BY time
+        ORDER BY time
+        """
+        return cls._fetch(sql, params)
+
+    @classmethod
+    def api_paths(
+        cls,
+        start_time: datetime,
+        end_time: datetime,
+        order_by: str = "requests",
+        limit: int = 20,
+        tenant_id: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        按接口聚合的请求指标, 用于查询请求量最大, 错误率最高或最慢的接口
+        :param order_by: 排序字段, 降序
+        :param limit: 返回的接口数量
+        """
+        if order_by not in LogConstant.METRIC_API_PATH_ORDERINGS:
+            raise ValueError(f"Invalid order_by: {order_by}")
+
+        where, params = cls._get_conditions(start_time, end_time, None, tenant_id)
+        params["limit"] = limit
+        sql = f"""
+        SELECT
+            api_path,
+            {cls._get_metric_columns()}
+        FROM {cls._get_table(3600, start_time, end_time)}
+        WHERE {where}
+        GROUP BY api_path
+        ORDER BY {order_by} DESC
+        LIMIT %(limit)s
+        """
+        return cls._fetch(sql, params)
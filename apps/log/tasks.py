@@ -1,31 +1,58 @@
+import socket
+
 from celery import shared_task
-from django.core.cache import cache
+from common.constants import CeleryPriority, CeleryQueue
 
-from .constants import LogConstant
 from .services import RequestLogService
 
 
 @shared_task(
-    name="process_request_log", bind=True, max_retries=3, default_retry_delay=10
+    name="process_request_log",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=10,
+    queue=CeleryQueue.INGESTION,
+    priority=CeleryPriority.HIGH,
 )
 def process_request_log(self, *args, **kwargs):
-    logs = kwargs.get("logs") or self.request.kwargs.get("task_data")
-    try:
-        if logs:
+    logs = kwargs.get("logs")
+    if logs:
+        try:
+            RequestLogService.enrich_batch(logs)
             RequestLogService.create_batch(logs)
-        else:
-            task_data = []
-            for _ in range(LogConstant.BATCH_PROCESS_SIZE):
-                value = cache.rpop(LogConstant.LOG_BATCH_LIST_KEY)
-                if not value:
-                    break
-                task_data.append(value)
-
-            if not task_data:
-                return
-
-            RequestLogService.create_batch(task_data)
+        except Exception as e:
+            print(f"process_request_log failed: {e}")
+            self.retry(exc=e, kwargs={"logs": logs})
+        return
+
+    consumer = self.request.hostname or socket.gethostname()
+    lock = RequestLogService.consumer_lock(consumer)
+    if not lock.acquire(blocking=False):
+        # 同一节点上已有进程在处理
+        return
+
+    try:
+        logs = RequestLogService.drain_queue(consumer)
+        if not logs:
+            return
+
+        RequestLogService.enrich_batch(logs)
+        RequestLogService.create_batch(logs)
+        RequestLogService.ack_queue(consumer)
     except Exception as e:
         print(f"process_request_log failed: {e}")
-        # 重试时从上下文中自动传递参数
-        self.retry(exc=e, logs=logs)
+        if RequestLogService.fail_queue(consumer):
+            # 多次写入失败, 已移动到死信队列
+            return
+        # 数据保留在 processing 队列中, 重试时会重新取出
+        self.retry(exc=e)
+    finally:
+        lock.release()
+
+
+@shared_task(name="recover_request_log_queues", queue=CeleryQueue.MAINTENANCE)
+def recover_request_log_queues(*args, **kwargs):
+    """
+    将已下线的消费者遗留的 processing 队列放回主队列
+    """
+    return RequestLogService.recover_queues()
@@ -1,11 +1,12 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .apis import RequestLogViewSet
+from .apis import RequestLogViewSet, RequestMetricViewSet
 
 router = SimpleRouter()
 
 router.register("request", RequestLogViewSet, basename="request")
+router.register("request-metric", RequestMetricViewSet, basename="request-metric")
 
 urlpatterns = [
     path("", include(router.urls)),
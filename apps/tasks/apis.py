@@ -1,10 +1,15 @@
+from common.pagination import KeysetPagination
 from common.permissions import HasPermission
 from common.services.jwt import SystemUserJWTAuthentication
 from common.views import BaseReadOnlyModelViewSet
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from .filters import CeleryTaskResultFilter
 from .serializers import (
     CeleryTaskResultOutputSerializer,
+    CeleryTaskRuntimeStatInputSerializer,
+    CeleryTaskRuntimeStatOutputSerializer,
     PeriodicTaskOutputSerializer,
 )
 from .services import CeleryTaskResultService, PeriodicTaskService
@@ -28,10 +33,24 @@ class CeleryTaskResultViewSet(BaseReadOnlyModelViewSet):
     permission_classes = (HasPermission,)
     service = CeleryTaskResultService
     queryset = service.all()
+    pagination_class = KeysetPagination
     serializer_class = CeleryTaskResultOutputSerializer
     filterset_class = CeleryTaskResultFilter
 
     action_permissions = {
         "list": "tasks:periodic_task_result:list",
         "retrieve": "tasks:periodic_task_result:retrieve",
+        "runtime_stats": "tasks:periodic_task_result:list",
     }
+
+    @action(methods=["GET"], detail=False, url_path="runtime-stats")
+    def runtime_stats(self, request):
+        serializer = CeleryTaskRuntimeStatInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            CeleryTaskRuntimeStatOutputSerializer(
+                self.service.runtime_stats(**serializer.validated_data),
+                many=True,
+            ).data
+        )
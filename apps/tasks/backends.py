@@ -1,20 +1,57 @@
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from celery import states
 from celery.backends.base import BaseBackend
+from celery.exceptions import TimeoutError
 from django.utils import timezone
+from loguru import logger
 
-from .services import CeleryTaskResultService
+from .constants import TasksConstant
+from .services import CeleryTaskResultService, CeleryTaskStateService
 
 
 class CeleryResultBackend(BaseBackend):
+    """
+    任务状态写入 Redis Hash, 用于 AsyncResult.get / state 等查询, 完成时通过 pub/sub 唤醒等待方
+    最终状态同时写入队列, 由消费者批量写入 ClickHouse, Redis 中的状态过期后从 ClickHouse 查询
+    发布任务时写入 PENDING 状态, 未完成任务的轮询只读取 Redis
+    """
+
+    # 任务状态写入失败后, 在该时间之前跳过未完成状态的写入, 避免每次状态变化都等待连接超时
+    _state_unavailable_until = 0.0
+
     def store_result(
         self, task_id, result, status, traceback=None, request=None, **kwargs
     ):
-        if status not in ["SUCCESS", "FAILURE", "RETRY", "REVOKED"]:
-            return
-
-        kwargs_data = getattr(request, "kwargs", {})
+        kwargs_data = getattr(request, "kwargs", None) or {}
         if not kwargs_data.get("log_result", True):
             return
 
+        now = timezone.now()
+        task_name = request.task if request else self.encode(request)
+        ready = status in states.READY_STATES
+        state = {
+            "status": status,
+            "result": self.encode(self.encode_result(result, status)),
+            "traceback": traceback or "",
+            "task_name": task_name,
+            "date_done": now.isoformat(),
+        }
+
+        if status in ["SUCCESS", "FAILURE", "RETRY", "REVOKED"]:
+            # 先写入队列, Redis 不可用时最终结果仍可进入缓冲区和磁盘
+            self._write_result(
+                task_id, result, status, traceback, task_name, request, now
+            )
+
+        self._save_state(task_id, state, ready)
+        return True
+
+    def _write_result(
+        self, task_id, result, status, traceback, task_name, request, now
+    ):
         """将任务结果存储到自定义的数据库模型中"""
         if isinstance(result, Exception):
             result = str(result)  # 将异常转换为字符串
@@ -29,10 +66,153 @@ class CeleryResultBackend(BaseBackend):
             "status": status,
             "result": result,
             "traceback": traceback,
-            "task_name": request.task if request else self.encode(request),
-            "created_at": timezone.now(),
+            "task_name": task_name,
+            "created_at": now,
+            **self._get_telemetry(request, now),
         }
 
         CeleryTaskResultService.write_to_queue(task_data)
 
-        return True
+    def _save_state(self, task_id, state: dict, ready: bool):
+        """
+        写入 Redis 中的任务状态, 失败时只记录日志, 不影响任务执行和结果写入
+        写入失败后的一段时间内跳过未完成的状态, 已完成的状态仍然尝试写入以唤醒等待方
+        """
+        cls = type(self)
+        if not ready and time.monotonic() < cls._state_unavailable_until:
+            return
+
+        try:
+            CeleryTaskStateService.save(
+                task_id,
+                state,
+                timeout=int(self.expires or TasksConstant.CELERY_TASK_STATE_TIMEOUT),
+                ready=ready,
+            )
+        except Exception as e:
+            cls._state_unavailable_until = (
+                time.monotonic() + TasksConstant.CELERY_TASK_STATE_RETRY_INTERVAL
+            )
+            logger.bind(component="CeleryResultBackend").error(
+                f"Failed to save state of task {task_id}: {e}"
+            )
+
+    @staticmethod
+    def _get_telemetry(request, now: datetime) -> dict:
+        """
+        根据消息头中的入队时间和 task_prerun 记录的开始时间计算排队和执行耗时
+        直接调用或任务执行前被撤销时没有这些信息, 对应字段使用默认值
+        """
+        telemetry = {
+            "retries": getattr(request, "retries", None) or 0,
+            "hostname": getattr(request, "hostname", None) or "",
+        }
+        started_at = getattr(request, TasksConstant.STARTED_AT_ATTR, None)
+        if started_at is None:
+            return telemetry
+
+        telemetry["started_at"] = datetime.fromtimestamp(started_at, dt_timezone.utc)
+        telemetry["runtime"] = round((now.timestamp() - started_at) * 1000, 3)
+
+        enqueued_at = getattr(request, TasksConstant.ENQUEUED_AT_HEADER, None)
+        if enqueued_at is not None:
+            telemetry["enqueued_at"] = datetime.fromtimestamp(
+                enqueued_at, dt_timezone.utc
+            )
+            # 延迟执行的任务从预定的执行时间开始计算排队耗时
+            eta = getattr(request, "eta", None)
+            if eta:
+                enqueued_at = max(enqueued_at, datetime.fromisoformat(eta).timestamp())
+            telemetry["queue_wait"] = round(max(started_at - enqueued_at, 0) * 1000, 3)
+        return telemetry
+
+    def _get_task_state(self, task_id):
+        """
+        从 Redis 中读取任务状态, 不存在时返回 None
+        """
+        state = CeleryTaskStateService.get(task_id)
+        if not state:
+            return None
+
+        status = state["status"].decode()
+        if status == states.PENDING:
+            # 发布时写入的标记, 只有 status 字段
+            return {"status": states.PENDING, "result": None}
+
+        return self.meta_from_decoded(
+            {
+                "task_id": task_id,
+                "status": status,
+                "result": self.decode(state["result"]),
+                "traceback": state["traceback"].decode() or None,
+                "date_done": state["date_done"].decode(),
+                "children": None,
+            }
+        )
+
+    def _get_task_meta_for(self, task_id):
+        meta = self._get_task_state(task_id)
+        if meta is not None:
+            return meta
+
+        # Redis 中的状态已过期或任务不是近期发布的, 从 ClickHouse 查询
+        task_result = CeleryTaskResultService.get_latest(task_id)
+        if task_result is None:
+            # 短时间缓存为 PENDING, 避免轮询不存在的任务时反复查询 ClickHouse
+            try:
+                CeleryTaskStateService.mark_pending(
+                    task_id, TasksConstant.CELERY_TASK_STATE_MISS_TIMEOUT
+                )
+            except Exception as e:
+                logger.bind(component="CeleryResultBackend").error(
+                    f"Failed to mark task {task_id} as pending: {e}"
+                )
+            return {"status": states.PENDING, "result": None}
+
+        status = task_result["status"]
+        result = self.decode(task_result["result"])
+        if status in self.EXCEPTION_STATES:
+            # 写入 ClickHouse 时异常已转换为字符串
+            result = self.exception_to_python(self.prepare_exception(Exception(result)))
+        return {
+            "task_id": task_id,
+            "status": status,
+            "result": result,
+            # 没有异常信息时写入的是 encode(None)
+            "traceback": (
+                None
+                if task_result["traceback"] in ("", self.encode(None))
+                else task_result["traceback"]
+            ),
+            "date_done": task_result["created_at"],
+            "children": None,
+        }
+
+    def wait_for(
+        self, task_id, timeout=None, interval=0.5, no_ack=True, on_interval=None
+    ):
+        """
+        等待任务完成, 先订阅完成通知再检查状态, 任务完成时立即唤醒
+        interval 为兜底的检查间隔, 只读取 Redis, 不查询 ClickHouse
+        """
+        self._ensure_not_eager()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with CeleryTaskStateService.subscribe(task_id) as pubsub:
+            meta = self.get_task_meta(task_id)
+            while meta["status"] not in states.READY_STATES:
+                if on_interval:
+                    on_interval()
+
+                wait = interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise TimeoutError("The operation timed out.")
+
+                pubsub.get_message(timeout=wait)
+                meta = self._get_task_state(task_id) or meta
+        return meta
+
+    def _forget(self, task_id):
+        CeleryTaskStateService.delete(task_id)
@@ -1,3 +1,48 @@
 class TasksConstant:
     CELERY_TASK_RESULT_KEY = "celery_task_results"
+    # 每个消费者独立的 processing 队列, 数据写入 ClickHouse 成功后才删除
+    CELERY_TASK_RESULT_PROCESSING_TEMPLATE = "celery_task_results:processing:{consumer}"
+    CELERY_TASK_RESULT_LOCK_TEMPLATE = "celery_task_results:lock:{consumer}"
+    CONSUMER_LOCK_TIMEOUT = 60 * 10
     BATCH_PROCESS_SIZE = 1000
+    # 近期任务状态, 用于 AsyncResult.get 等查询, 过期后从 ClickHouse 查询
+    CELERY_TASK_STATE_TEMPLATE = "celery_task_state:{task_id}"
+    # 任务完成时发布通知, 唤醒等待结果的调用方
+    CELERY_TASK_READY_CHANNEL_TEMPLATE = "celery_task_state:ready:{task_id}"
+    # 未配置 result_expires 时任务状态的过期时间, 单位为秒
+    CELERY_TASK_STATE_TIMEOUT = 24 * 60 * 60
+    # Redis 和 ClickHouse 中都没有的任务, 在 Redis 中缓存为 PENDING 的时间, 单位为秒
+    CELERY_TASK_STATE_MISS_TIMEOUT = 60
+    # 任务状态写入失败后跳过未完成状态的时间, 单位为秒
+    CELERY_TASK_STATE_RETRY_INTERVAL = 30
+    # 队列记录的字段顺序, 新增或调整字段时增加版本号, 旧版本保留用于解码
+    RECORD_SCHEMAS = {
+        1: ("task_id", "status", "result", "traceback", "task_name", "created_at"),
+        2: (
+            "task_id",
+            "status",
+            "result",
+            "traceback",
+            "task_name",
+            "created_at",
+            "enqueued_at",
+            "started_at",
+            "queue_wait",
+            "runtime",
+            "retries",
+            "hostname",
+        ),
+    }
+    # 发布任务时写入消息头的入队时间(时间戳), worker 中通过 task.request 读取
+    ENQUEUED_AT_HEADER = "enqueued_at"
+    # task_prerun 时记录在 task.request 上的开始执行时间(时间戳)
+    STARTED_AT_ATTR = "started_at"
+    RUNTIME_QUANTILES = (0.5, 0.95)
+    RUNTIME_STAT_ORDERINGS = (
+        "run_count",
+        "failure_count",
+        "runtime_p50",
+        "runtime_p95",
+        "queue_wait_p50",
+        "queue_wait_p95",
+    )
@@ -0,0 +1,93 @@
+import statistics
+import threading
+import time
+
+from authentication.tasks import update_user_last_active
+from common.constants import CeleryQueue
+from django.core.management.base import BaseCommand
+from log.tasks import process_request_log
+
+
+class Command(BaseCommand):
+    help = (
+        "大量用户活跃时间更新任务涌入时, 对比请求日志写入任务从发送到完成的延迟, "
+        "需先启动各 worker 池"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--flood", type=int, default=50000, help="发送的用户活跃时间更新任务数量"
+        )
+        parser.add_argument(
+            "--flood-threads", type=int, default=4, help="发送任务的线程数"
+        )
+        parser.add_argument("--probes", type=int, default=20, help="探测任务数量")
+        parser.add_argument(
+            "--probe-interval", type=float, default=0.5, help="探测间隔, 单位为秒"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=120, help="单个探测任务的超时时间"
+        )
+        parser.add_argument(
+            "--shared-queue",
+            action="store_true",
+            help="所有任务发送到 default 队列, 用于对比拆分队列前的情况",
+        )
+
+    def handle(self, *args, **options):
+        send_options = {}
+        if options["shared_queue"]:
+            send_options["queue"] = CeleryQueue.DEFAULT
+
+        self._report("baseline", self._probe(options, send_options))
+
+        sent = [0] * options["flood_threads"]
+        per_thread = options["flood"] // options["flood_threads"]
+
+        def flood(index):
+            for _ in range(per_thread):
+                # 会话不存在, worker 中不会写入数据
+                update_user_last_active.apply_async(
+                    kwargs={
+                        "device_session_key": "benchmark:task_routing",
+                        "log_result": False,
+                    },
+                    **send_options,
+                )
+                sent[index] += 1
+
+        threads = [
+            threading.Thread(target=flood, args=(index,), daemon=True)
+            for index in range(options["flood_threads"])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        self._report("under flood", self._probe(options, send_options))
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"flood: sent={sum(sent)} rate={sum(sent) / elapsed:.0f}/s "
+            f"queue={send_options.get('queue', update_user_last_active.queue)}"
+        )
+
+    @staticmethod
+    def _probe(options, send_options):
+        latencies = []
+        for _ in range(options["probes"]):
+            start = time.perf_counter()
+            result = process_request_log.apply_async(**send_options)
+            result.get(timeout=options["timeout"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(options["probe_interval"])
+        return latencies
+
+    def _report(self, name, latencies):
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        self.stdout.write(
+            f"{name:<12} probes={len(latencies)} "
+            f"p50={quantiles[49]:.1f}ms p95={quantiles[94]:.1f}ms "
+            f"max={max(latencies):.1f}ms"
+        )
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import celery_app
+
+
+class Command(BaseCommand):
+    help = "按 CELERY_WORKER_POOLS 中的配置启动只消费指定队列的 celery worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument("pool", help="worker 池名称")
+        parser.add_argument("--concurrency", type=int, help="并发数, 默认使用池的配置")
+        parser.add_argument("--loglevel", default="info")
+        parser.add_argument(
+            "extra", nargs="*", help="透传给 celery worker 的其他参数, 需放在 -- 之后"
+        )
+
+    def handle(self, *args, **options):
+        pool = settings.CELERY_WORKER_POOLS.get(options["pool"])
+        if pool is None:
+            raise CommandError(
+                f"Unknown pool {options['pool']}, "
+                f"choices: {', '.join(settings.CELERY_WORKER_POOLS)}"
+            )
+
+        argv = [
+            "worker",
+            "--hostname",
+            f"{options['pool']}@%h",
+            "--queues",
+            ",".join(pool["QUEUES"]),
+            "--concurrency",
+            str(options["concurrency"] or pool["CONCURRENCY"]),
+            "--prefetch-multiplier",
+            str(pool["PREFETCH_MULTIPLIER"]),
+            "--loglevel",
+            options["loglevel"],
+            *options["extra"],
+        ]
+        self.stdout.write(f"celery {' '.join(argv)}")
+        celery_app.worker_main(argv)
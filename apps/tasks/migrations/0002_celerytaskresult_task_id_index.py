@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-17 21:18
+
+import clickhouse_backend.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="celerytaskresult",
+            index=clickhouse_backend.models.Index(
+                fields=["task_id"],
+                granularity=64,
+                name="idx_task_id",
+                type=clickhouse_backend.models.BloomFilter(0.001),
+            ),
+        ),
+        # 新增的索引只对之后写入的数据生效, 为已有数据构建索引
+        migrations.RunSQL(
+            "ALTER TABLE tasks_celerytaskresult MATERIALIZE INDEX idx_task_id",
+            reverse_sql=migrations.RunSQL.noop,
+            hints={"clickhouse": True},
+        ),
+    ]
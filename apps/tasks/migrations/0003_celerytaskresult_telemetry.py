@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-17 21:19
+
+import clickhouse_backend.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0002_celerytaskresult_task_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="enqueued_at",
+            field=clickhouse_backend.models.DateTime64Field(
+                null=True, precision=3, verbose_name="入队时间"
+            ),
+        ),
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="hostname",
+            field=clickhouse_backend.models.StringField(
+                default="", verbose_name="worker 节点"
+            ),
+        ),
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="queue_wait",
+            field=clickhouse_backend.models.Float64Field(
+                default=0, verbose_name="排队耗时, 单位为毫秒"
+            ),
+        ),
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="retries",
+            field=clickhouse_backend.models.UInt16Field(
+                default=0, verbose_name="重试次数"
+            ),
+        ),
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="runtime",
+            field=clickhouse_backend.models.Float64Field(
+                default=0, verbose_name="执行耗时, 单位为毫秒"
+            ),
+        ),
+        migrations.AddField(
+            model_name="celerytaskresult",
+            name="started_at",
+            field=clickhouse_backend.models.DateTime64Field(
+                null=True, precision=3, verbose_name="开始执行时间"
+            ),
+        ),
+    ]
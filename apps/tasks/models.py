@@ -9,6 +9,20 @@ class CeleryTaskResult(ClickhouseModel):
     result = clickhouse_models.StringField(verbose_name="任务结果")
     traceback = clickhouse_models.StringField(default="", verbose_name="异常信息")
     created_at = clickhouse_models.DateTimeField()
+    enqueued_at = clickhouse_models.DateTime64Field(
+        precision=3, null=True, verbose_name="入队时间"
+    )
+    started_at = clickhouse_models.DateTime64Field(
+        precision=3, null=True, verbose_name="开始执行时间"
+    )
+    queue_wait = clickhouse_models.Float64Field(
+        default=0, verbose_name="排队耗时, 单位为毫秒"
+    )
+    runtime = clickhouse_models.Float64Field(
+        default=0, verbose_name="执行耗时, 单位为毫秒"
+    )
+    retries = clickhouse_models.UInt16Field(default=0, verbose_name="重试次数")
+    hostname = clickhouse_models.StringField(default="", verbose_name="worker 节点")
 
     class Meta:
         verbose_name = "异步任务结果"
@@ -17,6 +31,12 @@ class CeleryTaskResult(ClickhouseModel):
             partition_by=clickhouse_models.toYYYYMM("created_at"),
         )
         indexes = [
+            clickhouse_models.Index(
+                fields=["task_id"],
+                name="idx_task_id",
+                type=clickhouse_models.BloomFilter(0.001),
+                granularity=64,
+            ),
             clickhouse_models.Index(
                 fields=["task_name"],
                 name="idx_task_name",
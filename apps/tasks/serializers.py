@@ -1,7 +1,10 @@
+from common.exceptions import ApplicationException
 from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from django_celery_beat.models import CrontabSchedule, PeriodicTask
 from rest_framework import serializers
 
+from .constants import TasksConstant
 from .models import CeleryTaskResult
 
 
@@ -80,4 +83,37 @@ class CeleryTaskResultOutputSerializer(serializers.ModelSerializer):
             "result",
             "traceback",
             "created_at",
+            "enqueued_at",
+            "started_at",
+            "queue_wait",
+            "runtime",
+            "retries",
+            "hostname",
         )
+
+
+class CeleryTaskRuntimeStatInputSerializer(serializers.Serializer):
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    task_name = serializers.CharField(required=False, allow_blank=True)
+    order_by = serializers.ChoiceField(
+        choices=TasksConstant.RUNTIME_STAT_ORDERINGS, default="runtime_p95"
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=200, default=50)
+
+    def validate(self, attrs):
+        if attrs["start_time"] >= attrs["end_time"]:
+            raise ApplicationException(_("开始时间需早于结束时间"))
+        return attrs
+
+
+class CeleryTaskRuntimeStatOutputSerializer(serializers.Serializer):
+    task_name = serializers.CharField()
+    run_count = serializers.IntegerField()
+    failure_count = serializers.IntegerField()
+    retry_count = serializers.IntegerField()
+    runtime_p50 = serializers.FloatField(allow_null=True)
+    runtime_p95 = serializers.FloatField(allow_null=True)
+    runtime_max = serializers.FloatField(allow_null=True)
+    queue_wait_p50 = serializers.FloatField(allow_null=True)
+    queue_wait_p95 = serializers.FloatField(allow_null=True)
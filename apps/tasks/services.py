@@ -1,11 +1,62 @@
+import math
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from celery import states
+from common.buffer import BufferedQueueWriter
+from common.codecs import RecordCodec
+from common.db.clickhouse import bulk_insert_columnar
+from common.spill import DiskSpillQueue
+from django.conf import settings
 from django.core.cache import cache
-from django.db import transaction
+from django.db import connections, transaction
+from django.utils.functional import SimpleLazyObject
 from django_celery_beat.models import CrontabSchedule, PeriodicTask
 
 from .constants import TasksConstant
 from .models import CeleryTaskResult
 
 
+def _push_to_queue(task_datas):
+    size = settings.CELERY_TASK_RESULT_BUFFER["RECORDS_PER_ENTRY"]
+    entries = [
+        CeleryTaskResultService.codec.encode(task_datas[i : i + size])
+        for i in range(0, len(task_datas), size)
+    ]
+    CeleryTaskResultService.spill.push(entries)
+
+
+def _lpush_entries(entries):
+    cache.lpush_many(TasksConstant.CELERY_TASK_RESULT_KEY, entries, raw=True)
+
+
+def _create_buffer():
+    options = settings.CELERY_TASK_RESULT_BUFFER
+    return BufferedQueueWriter(
+        name="celery_task_result",
+        flush_func=_push_to_queue,
+        max_size=options["MAX_SIZE"],
+        flush_size=options["FLUSH_SIZE"],
+        flush_interval=options["FLUSH_INTERVAL"],
+        overflow_policy=options["OVERFLOW_POLICY"],
+        block_timeout=options["BLOCK_TIMEOUT"],
+    )
+
+
+def _create_spill():
+    options = settings.QUEUE_SPILL
+    return DiskSpillQueue(
+        name="celery_task_result",
+        directory=options["DIRECTORY"],
+        push_func=_lpush_entries,
+        max_bytes=options["MAX_BYTES"],
+        segment_bytes=options["SEGMENT_BYTES"],
+        replay_interval=options["REPLAY_INTERVAL"],
+        circuit_cooldown=options["CIRCUIT_COOLDOWN"],
+    )
+
+
 class CrontabScheduleService:
     @staticmethod
     def get_or_create(
@@ -90,15 +141,219 @@ class PeriodicTaskService:
 class CeleryTaskResultService:
     @staticmethod
     def create_batch(task_datas):
-        """批量写入"""
+        """批量写入, 按列通过原生协议写入, 不创建模型实例"""
+        return bulk_insert_columnar(CeleryTaskResult, task_datas)
+
+    @staticmethod
+    def create_batch_orm(task_datas):
+        """通过 ORM 批量写入"""
         task_results = [CeleryTaskResult(**task_data) for task_data in task_datas]
         return CeleryTaskResult.objects.bulk_create(task_results)
 
+    codec = RecordCodec(
+        TasksConstant.RECORD_SCHEMAS,
+        legacy_decoder=lambda value: cache.client.decode(value),
+    )
+    buffer = SimpleLazyObject(_create_buffer)
+    spill = SimpleLazyObject(_create_spill)
+
+    @classmethod
+    def write_to_queue(cls, task_data):
+        """写入进程内缓冲区, 由后台线程批量推送到队列"""
+        cls.buffer.put(task_data)
+
+    @classmethod
+    def flush_queue(cls):
+        """立即将缓冲区中的任务结果推送到队列, 用于 worker 进程退出时"""
+        cls.buffer.close()
+
+    @classmethod
+    def drain_queue(cls, consumer: str, count: int = TasksConstant.BATCH_PROCESS_SIZE):
+        """
+        从队列中取出一批任务结果, 移动到消费者的 processing 队列
+        上一批未确认时返回上一批的数据
+        :param consumer: 消费者标识
+        :param count: 取出的数量, 队列为空时返回已取出的部分
+        """
+        return cache.drain_records(
+            TasksConstant.CELERY_TASK_RESULT_KEY,
+            TasksConstant.CELERY_TASK_RESULT_PROCESSING_TEMPLATE.format(
+                consumer=consumer
+            ),
+            count,
+            cls.codec.decode,
+            settings.CELERY_TASK_RESULT_BUFFER["RECORDS_PER_ENTRY"],
+        )
+
+    @staticmethod
+    def ack_queue(consumer: str):
+        """确认消费者 processing 队列中的任务结果已写入"""
+        cache.ack(
+            TasksConstant.CELERY_TASK_RESULT_PROCESSING_TEMPLATE.format(
+                consumer=consumer
+            )
+        )
+
+    @staticmethod
+    def consumer_lock(consumer: str):
+        """同一消费者同一时间只允许一个进程处理 processing 队列"""
+        return cache.lock(
+            TasksConstant.CELERY_TASK_RESULT_LOCK_TEMPLATE.format(consumer=consumer),
+            timeout=TasksConstant.CONSUMER_LOCK_TIMEOUT,
+            blocking=False,
+        )
+
     @staticmethod
-    def write_to_queue(task_data):
-        """写入队列"""
-        cache.lpush(TasksConstant.CELERY_TASK_RESULT_KEY, task_data)
+    def get_latest(task_id: str):
+        """
+        查询任务最后一次写入的结果, 用于 Redis 中的任务状态过期后
+        """
+        return (
+            CeleryTaskResult.objects.filter(task_id=task_id)
+            .order_by("-created_at")
+            .values("status", "result", "traceback", "task_name", "created_at")
+            .first()
+        )
+
+    @staticmethod
+    def runtime_stats(
+        start_time: datetime,
+        end_time: datetime,
+        task_name: Optional[str] = None,
+        order_by: str = "runtime_p95",
+        limit: int = 50,
+    ) -> List[Dict]:
+        """
+        按任务聚合的执行次数, 执行耗时和排队耗时分位数, 用于定位执行慢或排队久的任务
+        没有耗时信息的历史数据只计入执行次数, 对应的分位数为 None
+        :param start_time: 开始时间(包含)
+        :param end_time: 结束时间(不包含)
+        :param task_name: 任务名称, 为空时统计所有任务
+        :param order_by: 排序字段, 降序
+        :param limit: 返回的任务数量
+        """
+        if order_by not in TasksConstant.RUNTIME_STAT_ORDERINGS:
+            raise ValueError(f"Invalid order_by: {order_by}")
+
+        conditions = ["created_at >= %(start_time)s", "created_at < %(end_time)s"]
+        params = {"start_time": start_time, "end_time": end_time, "limit": limit}
+        if task_name:
+            conditions.append("task_name = %(task_name)s")
+            params["task_name"] = task_name
+
+        quantiles = ", ".join(str(q) for q in TasksConstant.RUNTIME_QUANTILES)
+        sql = f"""
+        SELECT
+            task_name,
+            count() AS run_count,
+            countIf(status = 'FAILURE') AS failure_count,
+            countIf(status = 'RETRY') AS retry_count,
+            quantilesIf({quantiles})(runtime, started_at IS NOT NULL) AS runtimes,
+            quantilesIf({quantiles})(queue_wait, enqueued_at IS NOT NULL) AS waits,
+            runtimes[1] AS runtime_p50,
+            runtimes[2] AS runtime_p95,
+            maxIf(runtime, started_at IS NOT NULL) AS runtime_max,
+            waits[1] AS queue_wait_p50,
+            waits[2] AS queue_wait_p95
+        FROM {CeleryTaskResult._meta.db_table}
+        WHERE {" AND ".join(conditions)}
+        GROUP BY task_name
+        ORDER BY {order_by} DESC
+        LIMIT %(limit)s
+        """
+        with connections["clickhouse"].cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            row.pop("runtimes")
+            row.pop("waits")
+            for key in (
+                "runtime_p50",
+                "runtime_p95",
+                "queue_wait_p50",
+                "queue_wait_p95",
+            ):
+                # 没有耗时信息时分位数为 nan
+                row[key] = None if math.isnan(row[key]) else round(row[key], 2)
+            if row["runtime_p50"] is None:
+                row["runtime_max"] = None
+        return rows
 
     @staticmethod
     def all():
         return CeleryTaskResult.objects.all().order_by("-created_at")
+
+
+class CeleryTaskStateService:
+    """
+    近期任务状态, 以 Hash 形式存储在 Redis 中, 过期时间与 result_expires 一致
+    字段值由 result backend 序列化, 不经过缓存的序列化和压缩
+    发布任务时写入只有 status 字段的 PENDING 状态, 状态不存在说明任务已过期或不是近期发布的
+    """
+
+    # 状态不存在时才写入 PENDING 并设置过期时间, 不覆盖已有的状态和过期时间
+    MARK_PENDING_SCRIPT = """
+    if redis.call("HSETNX", KEYS[1], "status", ARGV[1]) == 1 then
+        redis.call("EXPIRE", KEYS[1], ARGV[2])
+    end
+    """
+
+    @staticmethod
+    def save(task_id: str, state: dict, timeout: int, ready: bool = False):
+        """
+        写入任务状态, 任务完成时同时发布通知
+        :param task_id: 任务 ID
+        :param state: 任务状态, 值为 str 或 bytes
+        :param timeout: 过期时间, 单位为秒
+        :param ready: 任务是否已完成
+        """
+        cache.hset_with_ttl(
+            TasksConstant.CELERY_TASK_STATE_TEMPLATE.format(task_id=task_id),
+            state,
+            timeout,
+            channel=(
+                TasksConstant.CELERY_TASK_READY_CHANNEL_TEMPLATE.format(task_id=task_id)
+                if ready
+                else None
+            ),
+            message=state.get("status", ""),
+        )
+
+    @classmethod
+    def mark_pending(cls, task_id: str, timeout: int):
+        """
+        标记任务为 PENDING, 任务已有状态时(如重试时重新发布)不做修改
+        :param task_id: 任务 ID
+        :param timeout: 过期时间, 单位为秒
+        """
+        cache.execute_script(
+            cls.MARK_PENDING_SCRIPT,
+            keys=[TasksConstant.CELERY_TASK_STATE_TEMPLATE.format(task_id=task_id)],
+            args=[states.PENDING, timeout],
+        )
+
+    @staticmethod
+    def get(task_id: str):
+        """
+        读取任务状态, 不存在时返回空字典, 值为 bytes
+        """
+        return cache.hgetall(
+            TasksConstant.CELERY_TASK_STATE_TEMPLATE.format(task_id=task_id), raw=True
+        )
+
+    @staticmethod
+    def delete(task_id: str):
+        cache.delete(TasksConstant.CELERY_TASK_STATE_TEMPLATE.format(task_id=task_id))
+
+    @staticmethod
+    def subscribe(task_id: str):
+        """
+        订阅任务完成通知, 需要在 with 语句中使用, 退出时取消订阅
+        """
+        return closing(
+            cache.pubsub(
+                TasksConstant.CELERY_TASK_READY_CHANNEL_TEMPLATE.format(task_id=task_id)
+            )
+        )
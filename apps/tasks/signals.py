@@ -0,0 +1,57 @@
+import time
+
+from celery import current_app
+from celery.signals import (
+    before_task_publish,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from loguru import logger
+
+from .constants import TasksConstant
+from .services import CeleryTaskResultService, CeleryTaskStateService
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_task_results(**kwargs):
+    """worker 进程退出前将缓冲区中的任务结果推送到队列"""
+    CeleryTaskResultService.flush_queue()
+
+
+@before_task_publish.connect
+def record_enqueued_at(headers=None, **kwargs):
+    """发布任务时在消息头中记录入队时间, 重试时重新发布, 会覆盖为重试的入队时间"""
+    if headers is not None:
+        headers[TasksConstant.ENQUEUED_AT_HEADER] = time.time()
+
+
+@before_task_publish.connect
+def mark_task_pending(headers=None, **kwargs):
+    """
+    发布任务时在 Redis 中写入 PENDING 状态, 未完成的任务查询状态时不需要查询 ClickHouse
+    写入失败不影响任务发布, 只是该任务完成前的查询会回退到 ClickHouse
+    """
+    task_id = (headers or {}).get("id")
+    if not task_id:
+        return
+
+    try:
+        CeleryTaskStateService.mark_pending(
+            task_id,
+            timeout=int(
+                current_app.backend.expires or TasksConstant.CELERY_TASK_STATE_TIMEOUT
+            ),
+        )
+    except Exception as e:
+        logger.bind(component="CeleryResultBackend").error(
+            f"Failed to mark task {task_id} as pending: {e}"
+        )
+
+
+@task_prerun.connect
+def record_started_at(task=None, **kwargs):
+    """记录开始执行时间, 由 result backend 计算排队和执行耗时"""
+    if task is not None:
+        setattr(task.request, TasksConstant.STARTED_AT_ATTR, time.time())
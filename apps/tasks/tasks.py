@@ -1,31 +1,45 @@
+import socket
+
 from celery import shared_task
-from django.core.cache import cache
+from common.constants import CeleryPriority, CeleryQueue
 
-from .constants import TasksConstant
 from .services import CeleryTaskResultService
 
 
 @shared_task(
-    name="process_celery_task_results", bind=True, max_retries=3, default_retry_delay=10
+    name="process_celery_task_results",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=10,
+    queue=CeleryQueue.INGESTION,
+    priority=CeleryPriority.NORMAL,
 )
 def process_celery_task_results(self, *args, **kwargs):
-    task_data = kwargs.get("task_data") or self.request.kwargs.get("task_data")
-    try:
-        if task_data:
+    task_data = kwargs.get("task_data")
+    if task_data:
+        try:
             CeleryTaskResultService.create_batch(task_data)
-        else:
-            task_data = []
-            for _ in range(TasksConstant.BATCH_PROCESS_SIZE):
-                value = cache.rpop(TasksConstant.CELERY_TASK_RESULT_KEY)
-                if not value:
-                    break
-                task_data.append(value)
+        except Exception as e:
+            print(f"process_celery_task_results failed: {e}")
+            self.retry(exc=e, kwargs={"task_data": task_data})
+        return
 
-            if not task_data:
-                return
+    consumer = self.request.hostname or socket.gethostname()
+    lock = CeleryTaskResultService.consumer_lock(consumer)
+    if not lock.acquire(blocking=False):
+        # 同一节点上已有进程在处理
+        return
 
-            CeleryTaskResultService.create_batch(task_data)
+    try:
+        task_data = CeleryTaskResultService.drain_queue(consumer)
+        if not task_data:
+            return
+
+        CeleryTaskResultService.create_batch(task_data)
+        CeleryTaskResultService.ack_queue(consumer)
     except Exception as e:
         print(f"process_celery_task_results failed: {e}")
-        # 重试时从上下文中自动传递参数
-        self.retry(exc=e, task_data=task_data)
+        # 数据保留在 processing 队列中, 重试时会重新取出
+        self.retry(exc=e)
+    finally:
+        lock.release()
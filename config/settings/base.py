@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.middlewares.metrics.RequestMetricsMiddleware",
     "common.middlewares.client_request_log.ClientRequestLogMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -122,6 +123,11 @@ REST_FRAMEWORK = {
     "DATE_FORMAT": "%Y-%m-%d",
     "TIME_FORMAT": "%H:%M",
     "EXCEPTION_HANDLER": "common.exceptions.exception_handler",
+    "DEFAULT_PARSER_CLASSES": (
+        "common.parsers.CachedJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 1048576000
@@ -159,6 +165,57 @@ CACHES = {
 
 IP2LOCATION_DATABASE_PATH = env.str("IP2LOCATION_DATABASE_PATH")
 
+# 请求日志进程内缓冲区, 由后台线程按数量或时间间隔批量推送到 Redis
+REQUEST_LOG_BUFFER = {
+    "MAX_SIZE": env.int("REQUEST_LOG_BUFFER_MAX_SIZE", 10000),
+    "FLUSH_SIZE": env.int("REQUEST_LOG_BUFFER_FLUSH_SIZE", 200),
+    "FLUSH_INTERVAL": env.float("REQUEST_LOG_BUFFER_FLUSH_INTERVAL", 1.0),  # 秒
+    # drop_oldest / drop_new / block
+    "OVERFLOW_POLICY": env.str("REQUEST_LOG_BUFFER_OVERFLOW_POLICY", "drop_oldest"),
+    "BLOCK_TIMEOUT": env.float("REQUEST_LOG_BUFFER_BLOCK_TIMEOUT", 0.1),  # 秒
+    # 每个队列元素打包的日志条数, 打包后整体压缩
+    "RECORDS_PER_ENTRY": env.int("REQUEST_LOG_BUFFER_RECORDS_PER_ENTRY", 20),
+}
+
+# 异步任务结果进程内缓冲区, 每个 worker 进程按数量或时间间隔批量推送到 Redis
+CELERY_TASK_RESULT_BUFFER = {
+    "MAX_SIZE": env.int("CELERY_TASK_RESULT_BUFFER_MAX_SIZE", 10000),
+    "FLUSH_SIZE": env.int("CELERY_TASK_RESULT_BUFFER_FLUSH_SIZE", 100),
+    "FLUSH_INTERVAL": env.float("CELERY_TASK_RESULT_BUFFER_FLUSH_INTERVAL", 1.0),
+    "OVERFLOW_POLICY": env.str("CELERY_TASK_RESULT_BUFFER_OVERFLOW_POLICY", "block"),
+    "BLOCK_TIMEOUT": env.float("CELERY_TASK_RESULT_BUFFER_BLOCK_TIMEOUT", 1.0),
+    "RECORDS_PER_ENTRY": env.int("CELERY_TASK_RESULT_BUFFER_RECORDS_PER_ENTRY", 20),
+}
+
+# Redis 不可用时, 请求日志和任务结果队列写入本地分段文件, 恢复后由后台线程重新推送
+QUEUE_SPILL = {
+    "DIRECTORY": env.str("QUEUE_SPILL_DIRECTORY", "_queue_spill"),
+    "MAX_BYTES": env.int("QUEUE_SPILL_MAX_BYTES", 512 * 2**20),  # 每个队列
+    "SEGMENT_BYTES": env.int("QUEUE_SPILL_SEGMENT_BYTES", 4 * 2**20),
+    "REPLAY_INTERVAL": env.float("QUEUE_SPILL_REPLAY_INTERVAL", 5.0),  # 秒
+    "CIRCUIT_COOLDOWN": env.float("QUEUE_SPILL_CIRCUIT_COOLDOWN", 10.0),  # 秒
+}
+
+# 请求日志只记录不超过该大小(字节)的 JSON 和表单请求体, 文件上传等请求体不读取
+REQUEST_LOG_BODY_MAX_BYTES = env.int("REQUEST_LOG_BODY_MAX_BYTES", 64 * 1024)
+
+# 请求日志采样策略, 规则按顺序匹配路径(正则, 从开头匹配), 采样率为 0 表示不记录
+# 5xx 及耗时超过 SLOW_THRESHOLD_MS 的请求始终记录, 采样率会写入日志用于还原数量
+REQUEST_LOG_SAMPLING = {
+    "RULES": [
+        (r"/favicon\.ico$", 0),
+        (r"/static/", 0),
+        (r"/metrics$", 0),
+        (r"/api/v1/authentication/system-user/token-refresh/?$", 0.1),
+    ],
+    "DEFAULT_RATE": env.float("REQUEST_LOG_SAMPLING_DEFAULT_RATE", 1.0),
+    "SLOW_THRESHOLD_MS": env.int("REQUEST_LOG_SAMPLING_SLOW_THRESHOLD_MS", 1000),
+}
+
+# Prometheus 指标接口(/metrics)的访问令牌, 抓取时通过 Authorization: Bearer <token> 传入
+# 未配置时拒绝所有访问
+METRICS_BEARER_TOKEN = env.str("METRICS_BEARER_TOKEN", "")
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
         minutes=env.int("JWT_ACCESS_TOKEN_LIFETIME_MINUTES", 10),
@@ -199,3 +256,25 @@ CELERY_DEFAULT_ROUTING_KEY = "default"
 CELERY_DEFAULT_QUEUE = "default"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers.DatabaseScheduler"
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Redis broker 按优先级拆分队列, 0 为最高优先级
+CELERY_BROKER_TRANSPORT_OPTIONS = {"priority_steps": list(range(10)), "sep": ":"}
+# worker 池, 每个池只消费自己的队列, 通过 python manage.py run_worker_pool <name> 启动
+CELERY_WORKER_POOLS = {
+    # 批量写入 ClickHouse, 单个任务耗时长, 每次只预取一个, 避免任务积压在单个进程
+    "ingestion": {
+        "QUEUES": ("ingestion",),
+        "CONCURRENCY": env.int("CELERY_INGESTION_CONCURRENCY", 2),
+        "PREFETCH_MULTIPLIER": 1,
+    },
+    "maintenance": {
+        "QUEUES": ("maintenance", "default"),
+        "CONCURRENCY": env.int("CELERY_MAINTENANCE_CONCURRENCY", 1),
+        "PREFETCH_MULTIPLIER": 1,
+    },
+    # 数量大且耗时短, 预取更多以减少与 broker 的往返
+    "user_activity": {
+        "QUEUES": ("user_activity",),
+        "CONCURRENCY": env.int("CELERY_USER_ACTIVITY_CONCURRENCY", 4),
+        "PREFETCH_MULTIPLIER": 16,
+    },
+}
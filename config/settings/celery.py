@@ -10,12 +10,19 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
 
 app = Celery("my_saas")
 
-# celery -A config worker -Q default -l info -c 1
+# 按负载类型使用独立的 worker 池, 队列, 并发数和预取数量见 settings.CELERY_WORKER_POOLS:
+# python manage.py run_worker_pool ingestion
+# python manage.py run_worker_pool maintenance
+# python manage.py run_worker_pool user_activity
 # celery -A config beat -l info
+# 请求日志常驻消费者(近实时写入 ClickHouse, process_request_log 作为兜底):
+# python manage.py consume_request_log --workers 2
 
-app.conf.task_queues = (Queue("default", Exchange("default"), routing_key="default"),)
-
-app.conf.task_routes = {}
+# 任务所属的队列和优先级在各应用的 tasks.py 中通过 shared_task 的参数声明
+app.conf.task_queues = tuple(
+    Queue(name, Exchange(name), routing_key=name)
+    for name in ("default", "ingestion", "maintenance", "user_activity")
+)
 
 app.conf.update(
     task_default_queue="default",
@@ -28,14 +35,6 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # 配置定时任务
 app.conf.beat_schedule = {
-    "clean-expired-sessions-task": {
-        "task": "clean_expiration_access_token",
-        "schedule": crontab(minute="0"),  # 每小时的整点执行
-    },
-    "clean-expiration-refresh-token": {
-        "task": "clean_expiration_refresh_token",
-        "schedule": crontab(hour="*/8", minute="0"),  # 每 8 小时的整点执行
-    },
     "clean-expired-sessions": {
         "task": "clean_expired_sessions",
         "schedule": crontab(minute="0"),  # 每小时的整点执行
@@ -48,6 +47,10 @@ app.conf.beat_schedule = {
         "task": "process_request_log",
         "schedule": crontab(minute="*/5"),  # 每 5 分钟执行一次
     },
+    "recover_request_log_queues": {
+        "task": "recover_request_log_queues",
+        "schedule": crontab(minute="*/10"),  # 每 10 分钟执行一次
+    },
 }
 
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
@@ -1,3 +1,4 @@
+from common.metrics import metrics_view
 from django.conf import settings
 from django.urls import include, path
 
@@ -7,6 +8,7 @@ urlpatterns = [
     path("api/v1/tasks/", include("tasks.urls")),
     path("api/v1/log/", include("log.urls")),
     path("api/v1/system/", include("tenant.urls")),
+    path("metrics", metrics_view),
 ]
 
 if settings.DEBUG:
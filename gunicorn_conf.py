@@ -1,5 +1,6 @@
 import multiprocessing
 import os
+import shutil
 
 
 # 获取当前进程的 Worker ID (0-31)
@@ -24,6 +25,14 @@ def on_starting(server):
         f"[Gunicorn] Initialized Worker ID: {worker_id}, Datacenter ID: {datacenter_id}"
     )
 
+    # Prometheus 多进程模式, 各 worker 的指标写入该目录, /metrics 汇总后输出
+    # 需要在 worker 导入 prometheus_client 之前设置, 启动时清理上次运行遗留的数据
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", "/tmp/saas_prometheus_multiproc"
+    )
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
 
 def post_fork(server, worker):
     """
@@ -35,6 +44,24 @@ def post_fork(server, worker):
     print(f"[Gunicorn Worker] Worker ID: {worker_id} started with PID: {os.getpid()}")
 
 
+def worker_exit(server, worker):
+    """
+    Worker 进程退出时执行, 将缓冲区中剩余的请求日志推送到队列
+    """
+    from log.services import RequestLogService
+
+    RequestLogService.flush_queue()
+
+
+def child_exit(server, worker):
+    """
+    Worker 进程退出后在主进程中执行, 清理该进程的 Prometheus 实时指标
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
 # Gunicorn 配置参数
 workers = multiprocessing.cpu_count() * 2 + 1  # 根据 CPU 核心数计算 Worker 数量
 threads = 4  # 每个工作进程有 4 个线程